@@ -1,7 +1,8 @@
-from flask import Flask, request, jsonify, render_template
-from query_handler import answer_query, ask_llm_with_context
+from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context
+from query_handler import answer_query, ask_llm_with_context, stream_llm_with_context
+from relevance_gate import relevance_gate
 from speech_io import transcribe_audio_file, text_to_speech, transcribe_live
-from translation import detect_language, translate_to_english, translate_from_english
+from translation import detect_language, translate_to_english, translate_from_english, translate_stream_from_english
 from grammar_correction import correct_grammar
 from llm_client import llm
 from tensorflow.keras.models import load_model
@@ -9,14 +10,20 @@ from keras.preprocessing.image import img_to_array
 import cv2
 import os
 import base64
+import json
+import re
+import uuid
 import numpy as np
 import threading
-import whisper
-from voice_emotion import detect_voice_emotion
-from text_to_speech import synthesize_speech
+import time
+from asr_models import warm_up, OPENAI_WHISPER
+from voice_pipeline import run_voice_inference
+from voice_emotion import get_emotion_model, VOICE_EMOTION_ENABLED
+from audio_decode import decode_audio_bytes, SAMPLE_RATE
+from text_to_speech import synthesize_cached, tts_cache_path, tts_cache_url
 from main import (
     zep_client, get_zep_history, save_zep_message, clear_zep_memory,
-    build_history_for_llm, show_recap
+    show_recap
 )
 from dotenv import load_dotenv
 
@@ -28,28 +35,71 @@ face_classifier = cv2.CascadeClassifier('models/Emotion_Detection_CNN/haarcascad
 model = load_model('models/Emotion_Detection_CNN/model.h5')
 emotion_labels = ['Angry', 'Disgust', 'Fear', 'Happy', 'Neutral', 'Sad', 'Surprise']
 
-conversation_history = []
+SESSION_COOKIE = "session_id"
+SESSION_HEADER = "X-Session-ID"
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+# Load and warm up the Whisper model once at startup; every request reuses it
+voice_asr_model = warm_up(OPENAI_WHISPER, "base")
+# Same for the emotion model, unless voice emotion is disabled
+if VOICE_EMOTION_ENABLED:
+    get_emotion_model()
+
+# -------------------------------
+# Per-browser conversation sessions
+# -------------------------------
+def current_session_id():
+    """Session id from the X-Session-ID header or session cookie; a new one is issued if missing."""
+    if "session_id" in g:
+        return g.session_id
+    sid = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+    if not sid or not _SESSION_ID_RE.match(sid):
+        sid = uuid.uuid4().hex
+        g.new_session = True
+    g.session_id = sid
+    return sid
+
+
+@app.after_request
+def issue_session_cookie(response):
+    if g.get("new_session"):
+        response.set_cookie(SESSION_COOKIE, g.session_id, httponly=True, samesite="Lax")
+        response.headers[SESSION_HEADER] = g.session_id
+    return response
+
 
 # -------------------------------
 # Helper for async TTS
 # -------------------------------
-def generate_tts_async(reply, lang_code, output_path):
+def generate_tts_async(reply, lang_code):
     """Run TTS in background"""
     try:
-        synthesize_speech(reply, lang_code=lang_code, output_path=output_path)
+        output_path, _ = synthesize_cached(reply, lang_code)
         print(f"✅ TTS ready: {output_path}")
     except Exception as e:
         print(f"❌ TTS generation failed: {e}")
 
 
+def start_tts(reply, lang_code):
+    """Return the audio URL for reply, synthesizing it in background only if it is not cached."""
+    output_path = tts_cache_path(reply, lang_code)
+    try:
+        os.utime(output_path)  # cache hit: refresh its LRU position
+    except FileNotFoundError:
+        # Not cached, or evicted just now: synthesize again
+        threading.Thread(target=generate_tts_async, args=(reply, lang_code)).start()
+    return tts_cache_url(output_path)
+
+
 @app.route("/zep_test")
 def zep_test():
     if not zep_client:
         return jsonify({"status": "fallback", "msg": "⚠️ Zep client not initialized. Using local storage."})
 
     try:
-        save_zep_message("system", "Zep test message")
-        hist = get_zep_history()
+        session_id = current_session_id()
+        save_zep_message("system", "Zep test message", session_id)
+        hist = get_zep_history(session_id)
         return jsonify({
             "status": "ok",
             "msg": "✅ Zep client connected.",
@@ -59,17 +109,21 @@ def zep_test():
         return jsonify({"status": "error", "msg": str(e)})
 
 
+@app.route("/relevance_stats")
+def relevance_stats():
+    return jsonify(relevance_gate.stats())
+
+
 @app.route("/", methods=["GET"])
 def index():
+    current_session_id()
     return render_template("index.html")
 
 
 # -------------------------------
 # Query Processing
 # -------------------------------
-def process_query_with_language(user_input, detected_lang):
-    global conversation_history
-    
+def process_query_with_language(user_input, detected_lang, session_id):
     lang = detected_lang
     if lang and "-" not in lang:
         if lang == "en":
@@ -83,12 +137,15 @@ def process_query_with_language(user_input, detected_lang):
     
     print(f"🌍 Using provided language: {detected_lang} -> normalized: {lang}")
     
-    return _process_query_internal(user_input, lang)
+    return _process_query_internal(user_input, lang, session_id)
 
 
-def process_query(user_input):
-    global conversation_history
+def process_query(user_input, session_id):
+    lang = _detect_query_language(user_input)
+    return _process_query_internal(user_input, lang, session_id)
 
+
+def _detect_query_language(user_input):
     try:
         lang = detect_language(user_input)
         print(f"🌍 Detected language: {lang}")
@@ -104,11 +161,11 @@ def process_query(user_input):
             lang = "es-es"
         elif lang == "ar":
             lang = "ar-sa"
-    
-    return _process_query_internal(user_input, lang)
+    return lang
 
 
-def _process_query_internal(user_input, lang):
+def _prepare_query(user_input, lang, session_id):
+    """Correct, translate and store the user turn, then retrieve context. Returns (user_input_en, context_text, source_type)."""
     try:
         if lang in ["en", "fr", "ar"]:
             user_input = correct_grammar(user_input, lang)
@@ -122,25 +179,30 @@ def _process_query_internal(user_input, lang):
         print(f"⚠️ Translation to English failed: {e}")
         user_input_en = user_input
 
-    save_zep_message("user", user_input_en)
-
-    conversation_history = build_history_for_llm()
+    save_zep_message("user", user_input_en, session_id)
 
-    if not any(msg["role"] == "system" for msg in conversation_history):
-        system_prompt = {
-            "role": "system",
-            "content": "You are a kind and helpful assistant for breast cancer patients. "
-                       "Answer clearly, supportively, and based on known facts or provided context. "
-                       "If you don’t know, say so."
-        }
-        save_zep_message("system", system_prompt["content"])
-        conversation_history.insert(0, system_prompt)
+    # Only the raw history is needed here: the assembled (summarized) window is for callers that send it to the LLM
+    history = get_zep_history(session_id)
+    if not any("system" in (msg.get("role") or "").lower() for msg in history):
+        save_zep_message(
+            "system",
+            "You are a kind and helpful assistant for breast cancer patients. "
+            "Answer clearly, supportively, and based on known facts or provided context. "
+            "If you don’t know, say so.",
+            session_id
+        )
 
     context_text, source_type = answer_query(user_input_en, return_kb_only=True)
 
     print(f"\n📤 Retrieved from: {source_type.upper() if source_type else 'UNKNOWN'}")
     print(f"📚 Context:\n{context_text if context_text else '(No context)'}\n")
 
+    return user_input_en, context_text, source_type
+
+
+def _process_query_internal(user_input, lang, session_id):
+    user_input_en, context_text, source_type = _prepare_query(user_input, lang, session_id)
+
     if source_type in ["faq", "kb"]:
         try:
             response_en = ask_llm_with_context(user_input_en, context_text)
@@ -152,7 +214,7 @@ def _process_query_internal(user_input, lang):
     else:
         response_en = context_text
 
-    save_zep_message("assistant", response_en)
+    save_zep_message("assistant", response_en, session_id)
 
     try:
         response_local = translate_from_english(response_en, lang)
@@ -175,19 +237,30 @@ def analyze_voice():
     if file.filename == "":
         return jsonify({"error": "Empty filename"}), 400
 
-    UPLOAD_FOLDER = "uploads"
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    filepath = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(filepath)
-
-    if os.stat(filepath).st_size < 10_000:
+    # Kept in memory: decoded once and shared by Whisper and the emotion model
+    data = file.read()
+    if len(data) < 10_000:
         return jsonify({"error": "Audio file too short or empty"}), 400
 
+    timings = {}
+    started = time.perf_counter()
+
+    def _lap(stage, since):
+        now = time.perf_counter()
+        timings[stage] = round((now - since) * 1000, 1)
+        return now
+
     try:
-        print("🔍 Loading Whisper base model...")
-        model = whisper.load_model("base")
-        print("🗣️ Transcribing audio...")
-        result = model.transcribe(filepath, task="transcribe", language=None)
+        t = time.perf_counter()
+        audio = decode_audio_bytes(data, SAMPLE_RATE)
+        t = _lap("decode_ms", t)
+
+        print("🗣️ Transcribing audio and detecting emotion...")
+        result, emotion_result, inference_timings = run_voice_inference(voice_asr_model, audio, SAMPLE_RATE)
+        timings.update(inference_timings)
+        t = time.perf_counter()
+        if isinstance(emotion_result, Exception):
+            raise emotion_result
 
         transcription = result.get("text", "").strip()
         language = result.get("language", "unknown")
@@ -198,7 +271,7 @@ def analyze_voice():
         print(f"📜 Transcription: {transcription}")
         print(f"🌐 Detected Language: {language}")
 
-        emotion_result = detect_voice_emotion(filepath)
+        emotion_result = emotion_result or {}
         emotion_label = emotion_result.get("emotion")
         confidence_str = str(emotion_result.get("confidence", "0")).strip()
         if confidence_str.endswith("%"):
@@ -209,25 +282,28 @@ def analyze_voice():
             confidence_val = 0.0
 
         if language and language != "unknown":
-            reply, lang_local = process_query_with_language(transcription, language)
+            reply, lang_local = process_query_with_language(transcription, language, current_session_id())
         else:
-            reply, lang_local = process_query(transcription)
+            reply, lang_local = process_query(transcription, current_session_id())
+        t = _lap("query_ms", t)
         
         print(f"💬 LLM Response: {reply}")
 
-        audio_output_path = os.path.join("static", "llm_response.mp3")
         tts_language = language if language and language != "unknown" else lang_local
 
-        # run TTS in background
-        threading.Thread(target=generate_tts_async, args=(reply, tts_language, audio_output_path)).start()
+        # run TTS in background (served from cache when the reply was already synthesized)
+        audio_url = start_tts(reply, tts_language)
+        _lap("total_ms", started)
 
         return jsonify({
             "transcription": transcription,
             "language": language,
             "emotion": emotion_label,
             "confidence": confidence_val,
+            "emotion_timeline": emotion_result.get("timeline"),
             "response": reply,
-            "audio_url": "/static/llm_response.mp3"
+            "audio_url": audio_url,
+            "timings": timings
         })
 
     except Exception as e:
@@ -240,7 +316,7 @@ def analyze_voice():
 # -------------------------------
 @app.route("/recap", methods=["GET"])
 def recap():
-    msgs = get_zep_history()
+    msgs = get_zep_history(current_session_id())
     if not msgs:
         return jsonify({"recap": "No conversation history."})
 
@@ -256,7 +332,7 @@ def recap():
 
 @app.route("/clear_history", methods=["POST"])
 def clear_history():
-    success = clear_zep_memory()
+    success = clear_zep_memory(current_session_id())
     return jsonify({"cleared": success})
 
 
@@ -270,20 +346,85 @@ def handle_query():
     if not user_input:
         return jsonify({"error": "Empty input"}), 400
 
-    reply, lang = process_query(user_input)
+    reply, lang = process_query(user_input, current_session_id())
 
-    audio_output_path = os.path.join("static", "llm_response.mp3")
-    threading.Thread(target=generate_tts_async, args=(reply, lang, audio_output_path)).start()
+    audio_url = start_tts(reply, lang)
 
     return jsonify({
         "response": reply,
         "language": lang,
-        "audio_url": "/static/llm_response.mp3"
+        "audio_url": audio_url
     })
 
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route("/api/query/stream", methods=["POST"])
+def handle_query_stream():
+    """
+    Server-Sent Events variant of /api/query.
+    Emits `token` events as the answer is generated (sentence by sentence for ar/fr),
+    then one `done` event with the full response and its audio_url.
+    """
+    data = request.json or {}
+    user_input = data.get("message", "").strip()
+    if not user_input:
+        return jsonify({"error": "Empty input"}), 400
+    session_id = current_session_id()
+
+    def generate():
+        lang = _detect_query_language(user_input)
+        try:
+            user_input_en, context_text, source_type = _prepare_query(user_input, lang, session_id)
+        except Exception as e:
+            print(f"❌ Error preparing streamed query: {e}")
+            yield _sse("error", {"error": str(e)})
+            return
+
+        if source_type in ["faq", "kb"]:
+            pieces_en = stream_llm_with_context(user_input_en, context_text)
+        else:
+            pieces_en = iter([context_text or ""])
+
+        answer_en = []
+
+        def _collect(pieces):
+            for piece in pieces:
+                answer_en.append(piece)
+                yield piece
+
+        reply_parts = []
+        try:
+            for piece in translate_stream_from_english(_collect(pieces_en), lang):
+                reply_parts.append(piece)
+                yield _sse("token", {"text": piece})
+        except Exception as e:
+            print(f"❌ Error while streaming answer: {e}")
+            if not answer_en:
+                fallback = "Sorry, I encountered an issue answering that."
+                answer_en.append(fallback)
+                reply_parts.append(fallback)
+                yield _sse("token", {"text": fallback})
+
+        response_en = "".join(answer_en).strip()
+        reply = "".join(reply_parts).strip()
+        save_zep_message("assistant", response_en, session_id)
+
+        yield _sse("done", {
+            "response": reply,
+            "language": lang,
+            "audio_url": start_tts(reply, lang)
+        })
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @app.route("/chat")
 def chat_interface():
+    current_session_id()
     return render_template("index.html")
 
 
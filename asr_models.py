@@ -0,0 +1,65 @@
+# asr_models.py
+import os
+import threading
+import time
+import numpy as np
+
+# Process-wide registry: one model per (backend, size, compute_type)
+_models = {}
+_lock = threading.Lock()
+
+FASTER_WHISPER = "faster_whisper"
+OPENAI_WHISPER = "openai_whisper"
+
+ASR_DEVICE = os.getenv("ASR_DEVICE", "cpu")
+
+
+def _load(backend, size, compute_type):
+    if backend == FASTER_WHISPER:
+        from faster_whisper import WhisperModel
+        return WhisperModel(size, device=ASR_DEVICE, compute_type=compute_type or "default")
+    if backend == OPENAI_WHISPER:
+        import whisper
+        return whisper.load_model(size, device=ASR_DEVICE)
+    raise ValueError(f"Unknown ASR backend: {backend}")
+
+
+def get_asr_model(backend=FASTER_WHISPER, size="small", compute_type=None):
+    """
+    Return the shared ASR model for (backend, size, compute_type).
+    The model is loaded on first request and the same instance is returned afterwards.
+    """
+    key = (backend, size, compute_type)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            print(f"🔍 Loading ASR model {backend}/{size} (compute_type={compute_type})...")
+            start = time.perf_counter()
+            model = _load(backend, size, compute_type)
+            _models[key] = model
+            print(f"✅ ASR model {backend}/{size} loaded in {time.perf_counter() - start:.2f}s")
+    return model
+
+
+def warm_up(backend=FASTER_WHISPER, size="small", compute_type=None):
+    """Load the model and run one short silent clip through it so the first request pays no setup cost."""
+    model = get_asr_model(backend, size, compute_type)
+    silence = np.zeros(16000, dtype=np.float32)
+    try:
+        if backend == FASTER_WHISPER:
+            segments, _ = model.transcribe(silence, beam_size=1)
+            list(segments)
+        else:
+            model.transcribe(silence, fp16=False)
+    except Exception as e:
+        print(f"⚠️ ASR warm-up failed for {backend}/{size}: {e}")
+    return model
+
+
+def loaded_models():
+    """Keys of the models currently held by the registry."""
+    return list(_models.keys())
@@ -0,0 +1,26 @@
+# audio_decode.py
+import subprocess
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def decode_audio_bytes(data: bytes, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode any ffmpeg-readable audio (webm, wav, mp3, ...) from memory to a mono float32 array at sr Hz.
+    Piped through ffmpeg's stdin/stdout, so nothing is written to disk.
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr),
+        "pipe:1",
+    ]
+    try:
+        proc = subprocess.run(cmd, input=data, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg is required to decode audio but was not found on PATH")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='ignore')[-300:]}") from e
+
+    return np.frombuffer(proc.stdout, np.int16).astype(np.float32) / 32768.0
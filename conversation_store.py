@@ -0,0 +1,161 @@
+# conversation_store.py
+import os
+import re
+import sys
+import json
+import threading
+from collections import deque
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process lock only
+    fcntl = None
+
+CONVERSATION_DIR = Path(os.getenv("CONVERSATION_DIR", "conversations"))
+TAIL_CACHE_SIZE = int(os.getenv("CONVERSATION_TAIL_CACHE", "200"))
+
+_READ_BLOCK = 64 * 1024
+
+
+class ConversationStore:
+    """
+    Append-only local conversation log: one JSON line per message, one file per user.
+    Appends take a file lock; the last TAIL_CACHE_SIZE messages of each user are kept in memory.
+    """
+
+    def __init__(self, directory=CONVERSATION_DIR, tail_size=TAIL_CACHE_SIZE):
+        self.directory = Path(directory)
+        self.tail_size = tail_size
+        self._tails = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _path(self, user_id):
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", str(user_id)) or "default"
+        return self.directory / f"{safe}.jsonl"
+
+    def _lock(self, user_id):
+        with self._guard:
+            lock = self._locks.get(user_id)
+            if lock is None:
+                lock = self._locks[user_id] = threading.Lock()
+            return lock
+
+    def append(self, user_id, role, content):
+        line = json.dumps({"role": role, "content": content}, ensure_ascii=False) + "\n"
+        path = self._path(user_id)
+        with self._lock(user_id):
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf8") as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.write(line)
+                    f.flush()
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+            tail = self._tails.get(user_id)
+            if tail is not None:
+                tail.append({"role": role, "content": content})
+
+    def _read_tail_lines(self, path, n):
+        """Read the last n lines by scanning the file backwards in blocks."""
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            data = b""
+            while pos > 0 and data.count(b"\n") <= n:
+                step = min(_READ_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                data = f.read(step) + data
+        lines = [l for l in data.split(b"\n") if l.strip()]
+        return lines[-n:] if n else []
+
+    def _parse(self, lines):
+        msgs = []
+        for raw in lines:
+            try:
+                m = json.loads(raw)
+            except ValueError:
+                continue  # partial/corrupt line
+            msgs.append({"role": m.get("role"), "content": m.get("content")})
+        return msgs
+
+    def last(self, user_id, n):
+        """Last n messages in chronological order, without parsing the whole file."""
+        with self._lock(user_id):
+            tail = self._tails.get(user_id)
+            if tail is None:
+                path = self._path(user_id)
+                if not path.exists():
+                    tail = deque(maxlen=self.tail_size)
+                else:
+                    tail = deque(self._parse(self._read_tail_lines(path, self.tail_size)), maxlen=self.tail_size)
+                self._tails[user_id] = tail
+            if n <= len(tail) or len(tail) < self.tail_size:
+                return list(tail)[-n:] if n else []
+            path = self._path(user_id)
+            return self._parse(self._read_tail_lines(path, n))
+
+    def read_all(self, user_id):
+        path = self._path(user_id)
+        if not path.exists():
+            return []
+        with self._lock(user_id):
+            with open(path, "rb") as f:
+                return self._parse(f.read().split(b"\n"))
+
+    def clear(self, user_id):
+        path = self._path(user_id)
+        with self._lock(user_id):
+            self._tails.pop(user_id, None)
+            try:
+                if path.exists():
+                    path.unlink()
+                    return True
+            except Exception:
+                pass
+        return False
+
+    def forget(self, user_id):
+        """Drop the in-memory tail and lock of user_id (the file is kept)."""
+        with self._guard:
+            self._tails.pop(user_id, None)
+            self._locks.pop(user_id, None)
+
+    def migrate_json_array(self, legacy_path, user_id):
+        """
+        One-shot import of the old local_zep_fallback.json array into user_id's JSONL log.
+        The legacy file is renamed to *.migrated so the import never runs twice.
+        """
+        legacy_path = Path(legacy_path)
+        if not legacy_path.exists():
+            return 0
+        try:
+            msgs = json.loads(legacy_path.read_text(encoding="utf8"))
+        except Exception:
+            msgs = []
+        count = 0
+        for m in msgs:
+            if isinstance(m, dict) and m.get("role") and m.get("content"):
+                self.append(user_id, m["role"], m["content"])
+                count += 1
+        legacy_path.rename(legacy_path.with_name(legacy_path.name + ".migrated"))
+        print(f"🗂️ Migrated {count} messages from {legacy_path} to {self._path(user_id)}")
+        return count
+
+
+conversation_store = ConversationStore()
+
+
+if __name__ == "__main__":
+    # python conversation_store.py migrate [legacy.json] [user_id]
+    if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
+        legacy = sys.argv[2] if len(sys.argv) > 2 else "local_zep_fallback.json"
+        user = sys.argv[3] if len(sys.argv) > 3 else os.getenv("ZEP_USER_ID", "user_123")
+        conversation_store.migrate_json_array(legacy, user)
+    else:
+        print("usage: python conversation_store.py migrate [legacy.json] [user_id]")
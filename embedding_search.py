@@ -1,12 +1,18 @@
 import os
 import glob
 import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qdrant_models
 from dotenv import load_dotenv
 from qdrant_client.http.models import SearchRequest
+from local_index import get_local_index
+from grammar_correction import normalize_if_arabic
 
 
 # Load environment variables
@@ -15,63 +21,286 @@ QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 DOCS_COLLECTION = os.getenv("QDRANT_DOCS_COLLECTION", "docs_collection")
 FAQ_COLLECTION = os.getenv("QDRANT_FAQ_COLLECTION", "faq_collection")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+# "sequential": FAQ then KB on a miss; "batched": both collections searched together
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "sequential")
+# "qdrant": remote/in-process Qdrant; "local": memory-mapped NumPy index written at ingest
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
 
-# Initialize Qdrant client
-qdrant_client = QdrantClient(
-    url=QDRANT_URL,
-    api_key=QDRANT_API_KEY
-)
+FAQ_PATH = "KB/FAQ/FAQ.json"
+DOCS_PATH = "KB/breast_cancer_general_kb"
+
+# Initialize Qdrant client (QDRANT_URL=":memory:" runs qdrant-client in-process)
+if QDRANT_URL == ":memory:":
+    qdrant_client = QdrantClient(location=":memory:")
+else:
+    qdrant_client = QdrantClient(
+        url=QDRANT_URL,
+        api_key=QDRANT_API_KEY
+    )
+
+_search_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="qdrant-search")
 
 embedder = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
 
-def search_faq(query, threshold=0.7, max_hits=1):
-    q_emb = embedder.encode([query], convert_to_numpy=True)[0]
-    hits = qdrant_client.search(
+# -------------------------------
+# Query embedding cache
+# -------------------------------
+_embedding_cache = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+def normalize_query(text):
+    return " ".join((text or "").split())
+
+def embed_text(text):
+    """
+    Return (vector, cached) for text, encoding it only if it is not in the LRU cache.
+    The cache is keyed by the whitespace-normalized text.
+    """
+    key = normalize_query(text)
+    with _embedding_cache_lock:
+        vec = _embedding_cache.get(key)
+        if vec is not None:
+            _embedding_cache.move_to_end(key)
+            return vec, True
+
+    vec = embedder.encode([key], convert_to_numpy=True)[0]
+    with _embedding_cache_lock:
+        _embedding_cache[key] = vec
+        _embedding_cache.move_to_end(key)
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+    return vec, False
+
+
+class RetrievalContext:
+    """
+    Per-request embedding holder: every Qdrant call in one request reuses the same vector
+    for the same text, and counts how many encodes were avoided.
+    """
+
+    def __init__(self):
+        self.encodes = 0
+        self.encodes_saved = 0
+        self._vectors = {}
+
+    def embed(self, text):
+        key = normalize_query(text)
+        vec = self._vectors.get(key)
+        if vec is not None:
+            self.encodes_saved += 1
+            return vec
+        vec, cached = embed_text(key)
+        if cached:
+            self.encodes_saved += 1
+        else:
+            self.encodes += 1
+        self._vectors[key] = vec
+        return vec
+
+    def stats(self):
+        return {"encodes": self.encodes, "encodes_saved": self.encodes_saved}
+
+
+def _faq_answer(hits):
+    if not hits:
+        return None
+    return hits[0].payload.get("page_content", None)
+
+
+def _kb_results(hits):
+    results = []
+    for hit in hits:
+        payload = hit.payload
+        # Try chunk first (fallback data)
+        content = payload.get("chunk")
+        if not content:
+            # Then try page_content (old KB)
+            content = payload.get("page_content", "")
+
+        metadata = payload.get("metadata", {})
+        source = metadata.get("source") or payload.get("source", "unknown")
+        sim = hit.score
+
+        if sim > 0.75 and content.strip():
+            results.append({
+                "chunk": content,
+                "sim": sim,
+                "source": source
+            })
+    return results
+
+
+def _search_faq_hits(query_vector, threshold, max_hits):
+    if VECTOR_BACKEND == "local":
+        return get_local_index(FAQ_COLLECTION).search(query_vector, limit=max_hits, score_threshold=threshold)
+    return qdrant_client.search(
         collection_name=FAQ_COLLECTION,
-        query_vector=q_emb.tolist(),
+        query_vector=query_vector.tolist(),
         limit=max_hits,
         score_threshold=threshold,
         with_payload=True
     )
-    if not hits:
-        return None
-    return hits[0].payload.get("page_content", None)
 
 
-def search_kb(query, top_k=3):
-    query_vector = embedder.encode([query], convert_to_numpy=True)[0]
-    results = []
+def _search_kb_hits(query_vector, top_k):
+    if VECTOR_BACKEND == "local":
+        return get_local_index(DOCS_COLLECTION).search(query_vector, limit=top_k)
+    return qdrant_client.search(
+        collection_name=DOCS_COLLECTION,
+        query_vector=query_vector.tolist(),
+        limit=top_k,
+        with_payload=True
+    )
 
-    try:
-        hits = qdrant_client.search(
-            
-            collection_name=DOCS_COLLECTION,
-            query_vector=query_vector.tolist(),
-            limit=top_k,
-            with_payload=True
-        )
 
-        for hit in hits:
-            payload = hit.payload
-            # Try chunk first (fallback data)
-            content = payload.get("chunk")
-            if not content:
-                # Then try page_content (old KB)
-                content = payload.get("page_content", "")
+def search_faq(query, threshold=0.7, max_hits=1, ctx=None):
+    ctx = ctx or RetrievalContext()
+    q_emb = ctx.embed(query)
 
-            metadata = payload.get("metadata", {})
-            source = metadata.get("source") or payload.get("source", "unknown")
-            sim = hit.score
+    try:
+        return _faq_answer(_search_faq_hits(q_emb, threshold, max_hits))
+    except Exception as e:
+        print(f"❌ FAQ search failed: {e}")
+        return None
 
-            if sim > 0.75 and content.strip():
-                results.append({
-                    "chunk": content,
-                    "sim": sim,
-                    "source": source
-                })
 
-        return results
+def search_kb(query, top_k=3, ctx=None):
+    ctx = ctx or RetrievalContext()
+    query_vector = ctx.embed(query)
 
+    try:
+        return _kb_results(_search_kb_hits(query_vector, top_k))
     except Exception as e:
         print(f"❌ Qdrant search failed: {e}")
         return []
+
+
+def search_faq_and_kb(query, threshold=0.7, top_k=3, ctx=None):
+    """
+    Search the FAQ and KB collections concurrently (one round trip of latency instead of two).
+    Returns (faq_answer, kb_hits); callers apply the FAQ → KB priority themselves.
+    """
+    ctx = ctx or RetrievalContext()
+    query_vector = ctx.embed(query)
+
+    faq_future = _search_pool.submit(_search_faq_hits, query_vector, threshold, 1)
+    kb_future = _search_pool.submit(_search_kb_hits, query_vector, top_k)
+
+    try:
+        faq_answer = _faq_answer(faq_future.result())
+    except Exception as e:
+        print(f"❌ FAQ search failed: {e}")
+        faq_answer = None
+    try:
+        kb_hits = _kb_results(kb_future.result())
+    except Exception as e:
+        print(f"❌ Qdrant search failed: {e}")
+        kb_hits = []
+    return faq_answer, kb_hits
+
+
+def retrieve(query, ctx=None):
+    """
+    FAQ → KB retrieval honouring RETRIEVAL_MODE.
+    Returns (faq_answer, kb_hits); kb_hits is only looked up (sequential) or used (batched) on a FAQ miss.
+    """
+    ctx = ctx or RetrievalContext()
+    if RETRIEVAL_MODE == "batched":
+        faq_answer, kb_hits = search_faq_and_kb(query, ctx=ctx)
+        return (faq_answer, []) if faq_answer else (None, kb_hits)
+
+    faq_answer = search_faq(query, ctx=ctx)
+    if faq_answer:
+        return faq_answer, []
+    return None, search_kb(query, ctx=ctx)
+
+
+def collection_vectors(name):
+    """All stored vectors of a collection as a float32 matrix (local index if configured, else Qdrant scroll)."""
+    if VECTOR_BACKEND == "local":
+        return np.asarray(get_local_index(name).matrix, dtype=np.float32)
+
+    vectors, offset = [], None
+    while True:
+        points, offset = qdrant_client.scroll(
+            collection_name=name,
+            with_payload=False,
+            with_vectors=True,
+            limit=256,
+            offset=offset
+        )
+        vectors.extend(p.vector for p in points)
+        if offset is None:
+            break
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def seed_collections():
+    """
+    Index the FAQ and KB markdown files into the current client with the payload layout
+    used by vectorStore__hajer.py. Meant for the in-process ":memory:" mode.
+    """
+    faqs = json.load(open(FAQ_PATH, encoding="utf-8"))
+    faq_texts = [f"Q: {faq['question']}\nA: {faq['answer']}" for faq in faqs]
+    faq_payloads = [{"page_content": t, "metadata": {"source": faq.get("source", ""), "type": "faq"}}
+                    for t, faq in zip(faq_texts, faqs)]
+
+    doc_texts, doc_payloads = [], []
+    for path in sorted(glob.glob(os.path.join(DOCS_PATH, "*.md"))):
+        with open(path, encoding="utf-8") as f:
+            for chunk in f.read().split("\n\n"):
+                chunk = chunk.strip()
+                if chunk:
+                    doc_texts.append(chunk)
+                    doc_payloads.append({"page_content": chunk, "metadata": {"source": path, "type": "doc"}})
+
+    for name, texts, payloads in ((FAQ_COLLECTION, faq_texts, faq_payloads),
+                                  (DOCS_COLLECTION, doc_texts, doc_payloads)):
+        # Arabic is embedded normalized; payloads keep the original text
+        vectors = embedder.encode([normalize_if_arabic(t) for t in texts], convert_to_numpy=True)
+        qdrant_client.recreate_collection(
+            collection_name=name,
+            vectors_config=qdrant_models.VectorParams(size=vectors.shape[1], distance=qdrant_models.Distance.COSINE)
+        )
+        qdrant_client.upsert(
+            collection_name=name,
+            points=[qdrant_models.PointStruct(id=i, vector=v.tolist(), payload=p)
+                    for i, (v, p) in enumerate(zip(vectors, payloads))]
+        )
+        print(f"Indexed {len(texts)} points into '{name}'")
+
+
+def benchmark_retrieval(queries, repeat=5):
+    """Compare sequential FAQ → KB lookups against batched lookups; returns mean seconds per query."""
+    ctx = RetrievalContext()
+    for q in queries:
+        ctx.embed(q)  # keep encoding out of the timings
+
+    def _sequential(q):
+        return search_faq(q, ctx=ctx) or search_kb(q, ctx=ctx)
+
+    def _batched(q):
+        return search_faq_and_kb(q, ctx=ctx)
+
+    timings = {}
+    for name, fn in (("sequential", _sequential), ("batched", _batched)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for q in queries:
+                fn(q)
+        timings[name] = (time.perf_counter() - start) / (repeat * len(queries))
+    return timings
+
+
+if __name__ == "__main__":
+    sample_queries = [
+        "What are the symptoms of breast cancer?",
+        "How is breast cancer staged?",
+        "Can I get a mammogram without compression?",
+        "What support is available after a mastectomy?",
+    ]
+    if QDRANT_URL == ":memory:":
+        seed_collections()
+    for mode, secs in benchmark_retrieval(sample_queries).items():
+        print(f"{mode:>10}: {secs * 1000:.1f} ms/query")
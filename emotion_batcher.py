@@ -0,0 +1,159 @@
+# emotion_batcher.py
+import os
+import sys
+import time
+import queue
+import random
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+from voice_emotion import classify_batch, detect_voice_emotion_from_array, detect_voice_emotion_windowed
+
+# How long the first clip of a batch waits for company; 0 disables micro-batching
+EMOTION_BATCH_WINDOW_MS = float(os.getenv("EMOTION_BATCH_WINDOW_MS", "0"))
+EMOTION_MAX_BATCH = int(os.getenv("EMOTION_MAX_BATCH", "8"))
+# A bucket's longest clip may be at most this many times its shortest, to limit padding
+EMOTION_BUCKET_RATIO = float(os.getenv("EMOTION_BUCKET_RATIO", "1.5"))
+# torch intra-op threads of the batcher thread (half the cores, leaving the rest to Whisper)
+EMOTION_BATCH_THREADS = int(os.getenv("EMOTION_BATCH_THREADS", str(max(1, (os.cpu_count() or 2) // 2))))
+# Clips longer than this (or shorter than 1 s) use windowed analysis; 0 disables it
+EMOTION_WINDOWED_ABOVE_SECONDS = float(os.getenv("EMOTION_WINDOWED_ABOVE_SECONDS", "10"))
+
+SAMPLE_RATE = 16000
+
+
+class EmotionBatcher:
+    """
+    In-process micro-batching for HuBERT emotion inference.
+    Callers submit decoded clips and get a Future; a single worker thread collects clips for
+    window_ms, splits them into duration buckets and runs one padded forward per bucket.
+    """
+
+    def __init__(self, window_ms=EMOTION_BATCH_WINDOW_MS, max_batch=EMOTION_MAX_BATCH,
+                 bucket_ratio=EMOTION_BUCKET_RATIO, classify=classify_batch, threads=EMOTION_BATCH_THREADS):
+        self.window = window_ms / 1000.0
+        self.threads = threads
+        self.max_batch = max_batch
+        self.bucket_ratio = bucket_ratio
+        self.classify = classify
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self.clips = 0
+        self.forwards = 0
+        self.padded_samples = 0
+        self.total_samples = 0
+
+    def submit(self, audio):
+        audio = np.asarray(audio, dtype=np.float32)
+        if len(audio) < SAMPLE_RATE:  # less than 1 second
+            raise ValueError("Audio too short for emotion analysis. Minimum 1 second required.")
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((audio, future))
+        return future
+
+    def detect(self, audio, timeout=None):
+        """Blocking helper with the same result shape as detect_voice_emotion_from_array."""
+        return self.submit(audio).result(timeout)
+
+    def stats(self):
+        return {
+            "clips": self.clips,
+            "forwards": self.forwards,
+            "avg_batch": (self.clips / self.forwards) if self.forwards else 0.0,
+            "padding": (self.padded_samples / self.total_samples) if self.total_samples else 0.0,
+        }
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="emotion-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(pending) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    pending.append(self._queue.get(timeout=remaining))
+                else:
+                    pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return pending
+
+    def _buckets(self, pending):
+        pending.sort(key=lambda item: len(item[0]))
+        bucket = [pending[0]]
+        for item in pending[1:]:
+            if len(item[0]) > len(bucket[0][0]) * self.bucket_ratio:
+                yield bucket
+                bucket = []
+            bucket.append(item)
+        yield bucket
+
+    def _forward(self, bucket):
+        longest = len(bucket[-1][0])
+        try:
+            results = self.classify([audio for audio, _ in bucket], SAMPLE_RATE)
+        except Exception as e:
+            for _, future in bucket:
+                future.set_exception(e)
+            return
+        self.forwards += 1
+        self.clips += len(bucket)
+        self.total_samples += longest * len(bucket)
+        self.padded_samples += sum(longest - len(audio) for audio, _ in bucket)
+        for (_, future), result in zip(bucket, results):
+            future.set_result(result)
+
+    def _run(self):
+        import torch
+        torch.set_num_threads(max(1, self.threads))
+        while True:
+            for bucket in self._buckets(self._collect()):
+                self._forward(bucket)
+
+
+emotion_batcher = EmotionBatcher()
+
+
+def detect_emotion(audio, sampling_rate=SAMPLE_RATE):
+    """
+    detect_voice_emotion_from_array, with long (and sub-second) clips going to the windowed mode
+    and the rest routed through the batcher when EMOTION_BATCH_WINDOW_MS > 0.
+    """
+    if EMOTION_WINDOWED_ABOVE_SECONDS > 0 and not (
+            sampling_rate <= len(audio) <= EMOTION_WINDOWED_ABOVE_SECONDS * sampling_rate):
+        return detect_voice_emotion_windowed(audio, sampling_rate)
+    if EMOTION_BATCH_WINDOW_MS > 0:
+        return emotion_batcher.detect(audio)
+    return detect_voice_emotion_from_array(audio, sampling_rate)
+
+
+def benchmark_batch_window(clips, windows_ms=(0, 5, 10, 25, 50), concurrency=8):
+    """Clips per second with `concurrency` callers submitting all clips, for each batch window."""
+    rows = {}
+    for window_ms in windows_ms:
+        batcher = EmotionBatcher(window_ms=window_ms)
+        batcher.detect(clips[0])  # warm-up
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(batcher.detect, clips))
+        elapsed = time.perf_counter() - start
+        stats = batcher.stats()
+        rows[window_ms] = (len(clips) / elapsed, stats["avg_batch"], stats["padding"])
+    return rows
+
+
+if __name__ == "__main__":
+    # python emotion_batcher.py [n_clips]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    rng = random.Random(0)
+    clips = [np.random.default_rng(i).normal(0, 0.05, int(SAMPLE_RATE * rng.uniform(1.5, 8))).astype(np.float32)
+             for i in range(n)]
+    for window_ms, (per_sec, avg_batch, padding) in benchmark_batch_window(clips).items():
+        print(f"window {window_ms:>4} ms: {per_sec:6.2f} clips/s, avg batch {avg_batch:.1f}, padding {padding:.0%}")
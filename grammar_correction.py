@@ -1,8 +1,287 @@
-import language_tool_python
-from spellchecker import SpellChecker
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import os
 import re
+import sys
+import threading
+import time
+
+# Correction candidates come from the most frequent words of each pyspellchecker dictionary
+SPELL_INDEX_MAX_WORDS = int(os.getenv("SPELL_INDEX_MAX_WORDS", "30000"))
+SPELL_MAX_DISTANCE = 2
+SPELL_PREFIX_LENGTH = 7
+SPELL_MEMO_SIZE = int(os.getenv("SPELL_MEMO_SIZE", "20000"))
+
+# "spelling" (default) or "languagetool" (opt-in; starts a shared Java server on first use)
+GRAMMAR_BACKEND = os.getenv("GRAMMAR_BACKEND", "spelling")
+LANGUAGETOOL_TIMEOUT = float(os.getenv("LANGUAGETOOL_TIMEOUT", "2.0"))
+
+# Diacritics (fathatan..sukun) and tatweel removed; alef/yeh/teh marbuta variants folded
+_ARABIC_TABLE = str.maketrans({
+    **{chr(c): None for c in range(0x064B, 0x0653)},
+    "\u0640": None,    # Tatweel
+    "\u0625": "\u0627",  # Alef with hamza below
+    "\u0623": "\u0627",  # Alef with hamza above
+    "\u0622": "\u0627",  # Alef with madda
+    "\u0649": "\u064A",  # Alef maksura -> Yeh
+    "\u0629": "\u0647",  # Teh marbuta -> Heh
+})
+# Leading/trailing punctuation kept aside while the word itself is corrected
+_WORD_EDGES = re.compile(r'^([^\w]*)(.*?)([^\w]*)$', re.S)
+
+# Runs of non-Arabic characters: dropped, or a single space if they contain whitespace
+_NON_ARABIC_RUN = re.compile(r'[^\u0600-\u06FF]+')
+
+def _collapse_run(match):
+    return ' ' if any(c.isspace() for c in match.group()) else ''
 
 def normalize_arabic(text: str) -> str:
+    """Remove diacritics/tatweel, fold letter variants, drop non-Arabic characters and collapse spaces."""
+    return _NON_ARABIC_RUN.sub(_collapse_run, text.translate(_ARABIC_TABLE)).strip()
+
+def normalize_arabic_stream(chunks):
+    """
+    normalize_arabic over an iterable of text chunks, yielding normalized pieces as they are ready.
+    "".join(normalize_arabic_stream(chunks)) == normalize_arabic("".join(chunks)).
+    """
+    pending = ""
+    started = False
+    for chunk in chunks:
+        pending += chunk.translate(_ARABIC_TABLE)
+        # Keep a trailing non-Arabic run: it may continue in the next chunk
+        cut = len(pending)
+        while cut and not ("\u0600" <= pending[cut - 1] <= "\u06FF"):
+            cut -= 1
+        ready, pending = pending[:cut], pending[cut:]
+        out = _NON_ARABIC_RUN.sub(_collapse_run, ready)
+        if not started:
+            out = out.lstrip()
+        if out:
+            started = True
+            yield out
+    # a trailing run becomes whitespace or nothing; strip() drops it either way
+
+def normalize_if_arabic(text: str) -> str:
+    """Apply normalize_arabic to predominantly Arabic text (used at ingest); other text is unchanged."""
+    from language_detection import detect_language
+    return normalize_arabic(text) if detect_language(text) == "ar" else text
+
+
+# English and French spell checkers, loaded on first use
+_spellcheckers = {}
+_spellcheckers_lock = threading.Lock()
+
+def get_spellchecker(lang):
+    with _spellcheckers_lock:
+        spell = _spellcheckers.get(lang)
+        if spell is None:
+            from spellchecker import SpellChecker
+            spell = _spellcheckers[lang] = SpellChecker(language=lang)
+        return spell
+
+def _deletes(word, max_distance, prefix_length):
+    word = word[:prefix_length]
+    found = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+def _edit_distance(a, b, max_distance):
+    """Optimal string alignment distance, or max_distance + 1 once it is exceeded."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > max_distance:
+            return max_distance + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class SpellingCorrector:
+    """
+    Symmetric-delete (SymSpell-style) corrector over a pyspellchecker dictionary,
+    with a bounded memo of word -> correction shared across requests.
+    The delete index covers the SPELL_INDEX_MAX_WORDS most frequent words and is built on the
+    first misspelled word; words with no close frequent match fall back to SpellChecker.correction.
+    """
+
+    def __init__(self, spell, max_words=SPELL_INDEX_MAX_WORDS, max_distance=SPELL_MAX_DISTANCE,
+                 prefix_length=SPELL_PREFIX_LENGTH, memo_size=SPELL_MEMO_SIZE):
+        self.spell = spell
+        self.max_words = max_words
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.memo_size = memo_size
+        self._index = None
+        self._freq = None
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _build_index(self):
+        with self._lock:
+            if self._index is not None:
+                return
+            start = time.perf_counter()
+            words = sorted(self.spell.word_frequency.dictionary.items(), key=lambda kv: -kv[1])[:self.max_words]
+            index = {}
+            for word, _ in words:
+                for d in _deletes(word, self.max_distance, self.prefix_length):
+                    index.setdefault(d, []).append(word)
+            self._freq = dict(words)
+            self._index = index
+            print(f"🔡 Spelling index: {len(words)} words, {len(index)} deletes in {time.perf_counter() - start:.2f}s")
+
+    def lookup(self, word):
+        """Best correction for a lowercase word not in the dictionary, or None."""
+        if self._index is None:
+            self._build_index()
+        best, best_key = None, None
+        seen = set()
+        for d in _deletes(word, self.max_distance, self.prefix_length):
+            for candidate in self._index.get(d, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                dist = _edit_distance(word, candidate, self.max_distance)
+                if dist <= self.max_distance:
+                    key = (dist, -self._freq[candidate])
+                    if best_key is None or key < best_key:
+                        best, best_key = candidate, key
+        return best
+
+    def correct_word(self, word):
+        lead, core, trail = _WORD_EDGES.match(word).groups()
+        # Numbers and measurements ("45", "3cm", "BRCA1"), punctuation, acronyms ("HER", "PET")
+        # and very short tokens are left alone
+        if (not any(c.isalpha() for c in core) or any(c.isdigit() for c in core)
+                or core.isupper() or len(core) <= self.max_distance):
+            return word
+        if lead or trail:
+            return lead + self.correct_word(core) + trail
+        lower = word.lower()
+        if lower in self.spell:
+            return word
+        with self._lock:
+            if lower in self._memo:
+                self._memo.move_to_end(lower)
+                return self._memo[lower] or word
+        corrected = self.lookup(lower)
+        if corrected is None:
+            # Only rare dictionary words are close: fall back to pyspellchecker's full search (memoized too)
+            corrected = self.spell.correction(lower)
+        with self._lock:
+            self._memo[lower] = corrected
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return corrected or word
+
+    def correct_sentence(self, text):
+        """Correct every whitespace-separated word of text in one pass."""
+        return ' '.join(self.correct_word(w) for w in text.split())
+
+
+_correctors = {}
+
+def get_corrector(lang):
+    corrector = _correctors.get(lang)
+    if corrector is None:
+        corrector = _correctors.setdefault(lang, SpellingCorrector(get_spellchecker(lang)))
+    return corrector
+
+
+def fix_spelling(text: str, lang: str) -> str:
+    if lang not in ['en', 'fr']:
+        return text  # No fix for Arabic or others
+
+    return get_corrector(lang).correct_sentence(text)
+
+
+def fix_spelling_per_word(text: str, lang: str) -> str:
+    """Original word-by-word pyspellchecker loop, kept for benchmarking."""
+    if lang not in ['en', 'fr']:
+        return text
+
+    spell = get_spellchecker(lang)
+    words = text.split()
+    corrected_words = []
+
+    for word in words:
+        if word.lower() in spell:
+            corrected_words.append(word)
+        else:
+            corrected = spell.correction(word)
+            corrected_words.append(corrected if corrected else word)
+
+    return ' '.join(corrected_words)
+
+
+# Inputs the corrector must leave unchanged: ages, sizes, stages, gene/receptor names and punctuation
+SPELLING_PRESERVED = [
+    ("I am 45 years old - is it ok ?", "en"),
+    ("My tumor is 2 cm , stage 3", "en"),
+    ("what about stage 2b ?!", "en"),
+    ("tumor 3cm", "en"),
+    ("it is 12mm", "en"),
+    ("BRCA1 mutation", "en"),
+    ("HER2+ cancer", "en"),
+    ("is a PET scan needed", "en"),
+    ("Tumeur de 3 cm !", "fr"),
+    ("mutation BRCA2 à 52 ans ?", "fr"),
+]
+
+
+def check_spelling_preserved(samples=SPELLING_PRESERVED):
+    """Samples that fix_spelling changed at all, as (text, corrected)."""
+    changed = []
+    for text, lang in samples:
+        corrected = fix_spelling(text, lang)
+        if corrected != text:
+            changed.append((text, corrected))
+    return changed
+
+
+def benchmark_spelling(sentences=None, repeat=3):
+    """Seconds per sentence for the per-word loop vs the memoized SymSpell corrector (cold and warm)."""
+    sentences = sentences or [
+        "what are the sympotms of brest cancr",
+        "i had a mamogram last weak and i am worryed",
+        "how long does chemoterapy treatmant take",
+        "is a biopsi painfull",
+    ]
+    timings = {}
+    start = time.perf_counter()
+    for s in sentences:
+        fix_spelling_per_word(s, 'en')
+    timings["per-word loop"] = (time.perf_counter() - start) / len(sentences)
+
+    get_corrector('en')._build_index()
+    get_corrector('en')._memo.clear()
+    start = time.perf_counter()
+    for s in sentences:
+        fix_spelling(s, 'en')
+    timings["symspell (cold memo)"] = (time.perf_counter() - start) / len(sentences)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for s in sentences:
+            fix_spelling(s, 'en')
+    timings["symspell (warm memo)"] = (time.perf_counter() - start) / (repeat * len(sentences))
+    return timings
+
+
+def _normalize_arabic_reference(text: str) -> str:
+    """Previous multi-pass implementation, kept for equivalence checks."""
     # Remove diacritics (Tashkeel)
     diacritics = re.compile("""
          ّ    | # Shadda
@@ -35,33 +314,148 @@ def normalize_arabic(text: str) -> str:
     return text
 
 
-# English and French spell checkers
-spell_en = SpellChecker(language='en')
-spell_fr = SpellChecker(language='fr')
+ARABIC_SAMPLES = [
+    "مَرْحَبًا، كَيْفَ حَالُكِ؟",
+    "هل التصوير الشعاعي للثدي مؤلم؟",
+    "إنّ سرطانَ الثديِ قابلٌ للعلاج   إذا اكتُشف مبكراً",
+    "أنا خائفـــة من نتيجة الخزعة (biopsy) 123",
+    "  عسلامة\tعندي سؤال\nعلى الماموغرام !! ",
+    "مستشفى الأمل — قسم الأورام",
+    "HER2 إيجابي أو سلبي؟",
+    "",
+]
 
-def fix_spelling(text: str, lang: str) -> str:
-    if lang not in ['en', 'fr']:
-        return text  # No fix for Arabic or others
 
-    spell = spell_en if lang == 'en' else spell_fr
-    words = text.split()
-    corrected_words = []
+def check_arabic_equivalence(samples=ARABIC_SAMPLES, chunk_size=7):
+    """Samples where normalize_arabic (or its streaming variant) differs from the reference implementation."""
+    mismatches = []
+    for text in samples:
+        expected = _normalize_arabic_reference(text)
+        streamed = "".join(normalize_arabic_stream(text[i:i + chunk_size] for i in range(0, len(text), chunk_size)))
+        if normalize_arabic(text) != expected or streamed != expected:
+            mismatches.append((text, expected, normalize_arabic(text), streamed))
+    return mismatches
 
-    for word in words:
-        if word.lower() in spell:
-            corrected_words.append(word)
-        else:
-            corrected = spell.correction(word)
-            corrected_words.append(corrected if corrected else word)
 
-    return ' '.join(corrected_words)
+def benchmark_arabic(samples=ARABIC_SAMPLES, repeat=2000):
+    """Microseconds per call for the reference multi-pass normalizer and the single-pass one."""
+    timings = {}
+    for name, fn in (("reference", _normalize_arabic_reference), ("single-pass", normalize_arabic)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for t in samples:
+                fn(t)
+        timings[name] = (time.perf_counter() - start) / (repeat * len(samples)) * 1e6
+    return timings
+
+
+# -------------------------------
+# Grammar backends (all load lazily)
+# -------------------------------
+class SpellingBackend:
+    """Spelling-only correction for en/fr."""
+    langs = ('en', 'fr')
+
+    def correct(self, text, lang):
+        return fix_spelling(text, lang)
+
+
+class ArabicNormalizerBackend:
+    langs = ('ar',)
+
+    def correct(self, text, lang):
+        return normalize_arabic(text)
+
+
+class LanguageToolBackend:
+    """
+    LanguageTool grammar correction through one long-lived server per language, shared by all requests.
+    Each check is bounded by LANGUAGETOOL_TIMEOUT; on timeout or error the spelling result is returned.
+    """
+    langs = ('en', 'fr')
+    _lt_codes = {'en': 'en-US', 'fr': 'fr'}
+
+    def __init__(self, timeout=LANGUAGETOOL_TIMEOUT, fallback=None):
+        self.timeout = timeout
+        self.fallback = fallback or SpellingBackend()
+        self._tools = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="languagetool")
+
+    def tool(self, lang):
+        with self._lock:
+            tool = self._tools.get(lang)
+            if tool is None:
+                import language_tool_python
+                start = time.perf_counter()
+                tool = self._tools[lang] = language_tool_python.LanguageTool(self._lt_codes[lang])
+                print(f"✍️ LanguageTool ({lang}) started in {time.perf_counter() - start:.2f}s")
+            return tool
+
+    def correct(self, text, lang):
+        future = self._pool.submit(lambda: self.tool(lang).correct(text))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            print(f"⚠️ LanguageTool timed out after {self.timeout}s; using spelling correction")
+        except Exception as e:
+            print(f"⚠️ LanguageTool failed: {e}; using spelling correction")
+        return self.fallback.correct(text, lang)
+
+
+_backends = {}
+
+def get_backend(name):
+    backend = _backends.get(name)
+    if backend is None:
+        factory = {
+            "spelling": SpellingBackend,
+            "arabic": ArabicNormalizerBackend,
+            "languagetool": LanguageToolBackend,
+        }[name]
+        backend = _backends.setdefault(name, factory())
+    return backend
 
-tool = language_tool_python.LanguageTool('en-US')
 
 def correct_grammar(text: str, lang: str) -> str:
     if lang in ['en', 'fr']:
-        return fix_spelling(text, lang)
+        return get_backend(GRAMMAR_BACKEND).correct(text, lang)
     elif lang == 'ar':
-        return normalize_arabic(text)
+        return get_backend("arabic").correct(text, lang)
     else:
-        return text
\ No newline at end of file
+        return text
+
+
+def measure_cold_start(backend=GRAMMAR_BACKEND, lang='en', text="what are the sympotms of brest cancr"):
+    """Seconds for the first and second correct_grammar call with `backend` in a fresh process."""
+    start = time.perf_counter()
+    get_backend(backend).correct(text, lang)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    get_backend(backend).correct(text, lang)
+    return first, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "coldstart":
+        # python grammar_correction.py coldstart [spelling|languagetool]
+        name = sys.argv[2] if len(sys.argv) > 2 else GRAMMAR_BACKEND
+        first, second = measure_cold_start(name)
+        print(f"{name}: first call {first:.2f}s (includes backend load), warm call {second * 1000:.1f} ms")
+        sys.exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "arabic":
+        mismatches = check_arabic_equivalence()
+        print(f"equivalence: {len(ARABIC_SAMPLES) - len(mismatches)}/{len(ARABIC_SAMPLES)} samples match")
+        for m in mismatches:
+            print("  mismatch:", m)
+        for name, us in benchmark_arabic().items():
+            print(f"{name:>12}: {us:.1f} µs/call")
+        sys.exit(0)
+
+    changed = check_spelling_preserved()
+    print(f"numbers/punctuation preserved: {len(SPELLING_PRESERVED) - len(changed)}/{len(SPELLING_PRESERVED)} samples")
+    for text, corrected in changed:
+        print(f"  {text!r} -> {corrected!r}")
+    for name, secs in benchmark_spelling().items():
+        print(f"{name:>22}: {secs * 1000:.2f} ms/sentence")
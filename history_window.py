@@ -0,0 +1,157 @@
+# history_window.py
+import os
+import threading
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+# Older turns are folded into the summary this many messages at a time (one summarizer call per fold)
+SUMMARY_BATCH = int(os.getenv("HISTORY_SUMMARY_BATCH", "6"))
+# Room kept for a summary that does not exist yet (the summarizer is asked for under 120 words)
+SUMMARY_TOKENS = 200
+SUMMARY_INPUT_CHARS = int(os.getenv("HISTORY_SUMMARY_INPUT_CHARS", "12000"))
+
+_MESSAGE_OVERHEAD = 4  # role/formatting tokens per chat message
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for Llama-style tokenizers)."""
+    return max(1, len(text or "") // 4)
+
+
+def message_tokens(messages):
+    return sum(estimate_tokens(m["content"]) + _MESSAGE_OVERHEAD for m in messages)
+
+
+def llm_summarizer(previous_summary, messages):
+    """Fold messages into previous_summary with the chat LLM."""
+    from llm_client import llm
+
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    # A cold start can fold a long history at once; keep the prompt within the model's context
+    transcript = transcript[-SUMMARY_INPUT_CHARS:]
+    prompt = (
+        "Update the running summary of a conversation between a breast cancer patient and a support assistant. "
+        "Keep medical facts, the patient's situation and concerns; be brief (under 120 words).\n\n"
+        f"CURRENT SUMMARY:\n{previous_summary or '(none)'}\n\nNEW MESSAGES:\n{transcript}"
+    )
+    return llm([{"role": "system", "content": prompt}])
+
+
+class HistoryAssembler:
+    """
+    Builds the LLM history: the system prompt once, a rolling summary of older turns,
+    then the most recent turns that fit in the token budget.
+    The summary is cached per user and extended incrementally as turns leave the window; each
+    assemble makes at most one summarizer call, however many turns have to be folded.
+    """
+
+    def __init__(self, budget=HISTORY_TOKEN_BUDGET, summarizer=llm_summarizer, batch=SUMMARY_BATCH, verbose=True):
+        self.budget = budget
+        self.verbose = verbose
+        self.summarizer = summarizer
+        self.batch = max(1, batch)
+        self.last_prompt_tokens = 0
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def reset(self, user_id):
+        with self._lock:
+            self._state.pop(user_id, None)
+
+    @staticmethod
+    def _resume(state, turns):
+        """
+        Index of the first turn not yet in the summary. Histories are capped (oldest messages drop off),
+        so the last folded message is located by content, scanning back from where it was.
+        """
+        if state["last"] is None:
+            return 0
+        for i in range(min(state["folded"], len(turns)) - 1, -1, -1):
+            if turns[i] == state["last"]:
+                return i + 1
+        return 0  # it dropped off the front: every remaining turn is newer
+
+    def assemble(self, user_id, messages):
+        system = next((m for m in messages if m["role"] == "system"), None)
+        turns = [m for m in messages if m["role"] != "system"]
+
+        with self._lock:
+            state = self._state.get(user_id)
+            if state is None:
+                state = self._state[user_id] = {"folded": 0, "summary": "", "last": None}
+
+        fixed = [system] if system else []
+        start = self._resume(state, turns)
+
+        def _window(start, summary):
+            head = list(fixed)
+            if summary:
+                head.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+            return head + turns[start:]
+
+        window = _window(start, state["summary"])
+        if message_tokens(window) > self.budget and start < len(turns) - 1:
+            # Pick how far to fold before calling the summarizer, so one call covers the whole
+            # overflow (e.g. a long history after a restart) instead of one call per batch
+            reserve = message_tokens(window[len(fixed):len(fixed) + 1]) if state["summary"] else SUMMARY_TOKENS
+            remaining = message_tokens(fixed) + reserve + message_tokens(turns[start:])
+            end = start
+            while remaining > self.budget and end < len(turns) - 1:
+                step_end = min(end + self.batch, len(turns) - 1)
+                remaining -= message_tokens(turns[end:step_end])
+                end = step_end
+            try:
+                summary = self.summarizer(state["summary"], turns[start:end])
+            except Exception as e:
+                print(f"⚠️ History summary failed: {e}")
+                summary = state["summary"]
+            start = end
+            with self._lock:
+                state["summary"], state["folded"], state["last"] = summary, start, turns[start - 1]
+            window = _window(start, summary)
+
+        self.last_prompt_tokens = message_tokens(window)
+        if self.verbose:
+            print(f"🧾 History: {len(window)} messages, ~{self.last_prompt_tokens} prompt tokens "
+                  f"({start} older turns summarized)")
+        return window
+
+
+history_assembler = HistoryAssembler()
+
+
+def benchmark_prompt_growth(turns=200, budget=HISTORY_TOKEN_BUDGET):
+    """Prompt tokens per turn over a synthetic conversation: unbounded history vs HistoryAssembler."""
+    def fake_summarizer(previous, msgs):
+        return (previous + " " + " ".join(m["content"][:40] for m in msgs))[-480:]
+
+    assembler = HistoryAssembler(budget=budget, summarizer=fake_summarizer, verbose=False)
+    system = {"role": "system", "content": "You are a kind and helpful assistant for breast cancer patients."}
+    history = [system]
+    rows = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Question {i} about my treatment and side effects? " * 2})
+        history.append({"role": "assistant", "content": f"Answer {i} with supportive details and facts. " * 8})
+        history.append(dict(system))  # duplicate system prompts, as seen in stored histories
+        window = assembler.assemble("bench", history)
+        rows.append((i + 1, message_tokens(history), message_tokens(window)))
+    return rows
+
+
+def cold_start_summary_calls(messages=200, budget=HISTORY_TOKEN_BUDGET):
+    """Summarizer calls made by the first assemble of a long stored history (e.g. after a restart)."""
+    calls = []
+    assembler = HistoryAssembler(budget=budget, summarizer=lambda previous, msgs: calls.append(msgs) or "summary",
+                                 verbose=False)
+    history = [{"role": "system", "content": "You are a kind and helpful assistant for breast cancer patients."}]
+    for i in range(messages // 2):
+        history.append({"role": "user", "content": f"Question {i} about my treatment and side effects? " * 2})
+        history.append({"role": "assistant", "content": f"Answer {i} with supportive details and facts. " * 8})
+    assembler.assemble("cold", history)
+    return len(calls)
+
+
+if __name__ == "__main__":
+    print(f"cold start with 200 stored messages: {cold_start_summary_calls()} summarizer call(s)")
+    for turn, unbounded, bounded in benchmark_prompt_growth():
+        if turn in (1, 10, 25, 50, 100, 150, 200):
+            print(f"turn {turn:>3}: unbounded ~{unbounded:>6} tokens | windowed ~{bounded:>5} tokens")
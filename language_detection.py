@@ -0,0 +1,149 @@
+# language_detection.py
+import re
+import time
+from functools import lru_cache
+from langdetect import DetectorFactory, detect
+from langdetect.detector_factory import init_factory
+
+# Deterministic langdetect, with its language profiles loaded once at import instead of on the first call
+DetectorFactory.seed = 0
+init_factory()
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+_ARABIC_RE = re.compile(r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]")
+_LATIN_RE = re.compile(r"[A-Za-z\u00C0-\u024F]")
+
+# Words that are frequent in one language and rare in the other (no "a", "on", "de"-style overlaps)
+ENGLISH_WORDS = frozenset("""
+hello hi hey what how when where why who which the an is are was were have has had do does did
+can could will would should may might i my me you your it this that these those there with about
+and of to for from not no yes please thanks thank breast symptoms treatment after before
+""".split())
+
+FRENCH_WORDS = frozenset("""
+bonjour salut merci le la les un une des du est et je tu il elle nous vous ils elles sont suis
+pour avec dans sur pas que qui quoi comment pourquoi quand où mon ma mes ton ta tes son sa ses
+ce cette ces au aux peut faire très mais ou sein seins être avoir traitement
+""".split())
+
+# French elision ("j'ai", "c'est", "l'examen", "qu'il"): the short word must stand right before an apostrophe
+_FRENCH_ELISION_RE = re.compile(r"(?<![^\W\d_])(?:qu|[jcdlmnst])['’](?=[^\W\d_])", re.IGNORECASE)
+
+
+@lru_cache(maxsize=2048)
+def _detect(text):
+    arabic = len(_ARABIC_RE.findall(text))
+    if arabic and arabic >= len(_LATIN_RE.findall(text)):
+        return "ar"
+
+    en = 0
+    fr = len(_FRENCH_ELISION_RE.findall(text))
+    for token in _WORD_RE.findall(text.lower()):
+        if token in ENGLISH_WORDS:
+            en += 1
+        elif token in FRENCH_WORDS:
+            fr += 1
+    if en > fr:
+        return "en"
+    if fr > en:
+        return "fr"
+
+    lang = detect(text)
+    print(f"[LANG] langdetect result: {lang} for text: '{text}'")
+    # Normalize to base language codes for translation
+    if lang and "-" in lang:
+        lang = lang.split("-")[0]
+    # Short Latin-script inputs ("ok", "Tamoxifen") get arbitrary codes; only en/fr are supported there
+    if lang not in ("en", "fr", "ar") and _LATIN_RE.search(text):
+        lang = "en"
+    return lang
+
+
+def detect_language(text):
+    """
+    Script check (Arabic vs Latin), then whole-word en/fr indicator counts,
+    then seeded langdetect. Results are cached, so repeated calls on the same text are free.
+    """
+    try:
+        text = (text or "").strip()
+        if not text:
+            return "en"
+        return _detect(text)
+    except Exception as e:
+        print(f"[LANG] Error in language detection: {e}")
+        return "en"
+
+
+# Labelled samples for accuracy checks
+LANGUAGE_SAMPLES = [
+    ("What are the early symptoms of breast cancer?", "en"),
+    ("Is a mammogram painful?", "en"),
+    ("hello", "en"),
+    ("I am scared about my biopsy results", "en"),
+    ("How long does chemotherapy last?", "en"),
+    ("Can men get breast cancer too?", "en"),
+    ("AI diagnosis", "en"),
+    ("I'd like info", "en"),
+    ("mammogram", "en"),
+    ("ok", "en"),
+    ("Tamoxifen", "en"),
+    ("It's my mom's biopsy", "en"),
+    ("Quels sont les symptômes du cancer du sein ?", "fr"),
+    ("bonjour", "fr"),
+    ("J'ai peur de la chimiothérapie", "fr"),
+    ("Est-ce que la mammographie fait mal ?", "fr"),
+    ("Comment se passe une biopsie ?", "fr"),
+    ("Mon médecin a trouvé une masse dans mon sein", "fr"),
+    ("C'est grave ?", "fr"),
+    ("Qu'est-ce qu'une tumeur bénigne ?", "fr"),
+    ("l'hormonothérapie", "fr"),
+    ("ما هي أعراض سرطان الثدي؟", "ar"),
+    ("مرحبا", "ar"),
+    ("هل التصوير الشعاعي للثدي مؤلم؟", "ar"),
+    ("أنا خائفة من نتيجة الخزعة", "ar"),
+    ("كم يستغرق العلاج الكيميائي؟", "ar"),
+    ("عسلامة، عندي سؤال على الماموغرام", "ar"),
+]
+
+
+def evaluate_language_detection(samples=LANGUAGE_SAMPLES):
+    """Return (accuracy, misclassified samples)."""
+    _detect.cache_clear()
+    wrong = [(text, expected, detect_language(text)) for text, expected in samples
+             if detect_language(text) != expected]
+    return 1 - len(wrong) / len(samples), wrong
+
+
+def benchmark_language_detection(samples=LANGUAGE_SAMPLES, repeat=200):
+    """Microseconds per call: uncached detector, cached detector, and langdetect alone."""
+    texts = [t for t, _ in samples]
+    timings = {}
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        _detect.cache_clear()
+        for t in texts:
+            _detect(t)
+    timings["detector"] = (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for t in texts:
+            detect_language(t)
+    timings["detector (cached)"] = (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+
+    start = time.perf_counter()
+    for _ in range(max(1, repeat // 10)):
+        for t in texts:
+            detect(t)
+    timings["langdetect"] = (time.perf_counter() - start) / (max(1, repeat // 10) * len(texts)) * 1e6
+    return timings
+
+
+if __name__ == "__main__":
+    accuracy, wrong = evaluate_language_detection()
+    print(f"accuracy: {accuracy:.0%} on {len(LANGUAGE_SAMPLES)} samples")
+    for text, expected, got in wrong:
+        print(f"  {text!r}: expected {expected}, got {got}")
+    for name, us in benchmark_language_detection().items():
+        print(f"{name:>18}: {us:.1f} µs/call")
@@ -0,0 +1,230 @@
+# live_transcription.py
+import os
+import sys
+import time
+import queue
+import numpy as np
+
+SAMPLE_RATE = 16000
+# Frame size shared by the microphone and WAV sources
+LIVE_FRAME_MS = int(os.getenv("LIVE_FRAME_MS", "30"))
+# Trailing silence that ends an utterance, and how long to wait for speech to start
+LIVE_SILENCE_MS = int(os.getenv("LIVE_SILENCE_MS", "800"))
+LIVE_START_TIMEOUT_SECONDS = float(os.getenv("LIVE_START_TIMEOUT_SECONDS", "8"))
+# Utterance cap (Whisper's window) and how much new audio triggers a partial hypothesis
+LIVE_MAX_SECONDS = float(os.getenv("LIVE_MAX_SECONDS", "30"))
+LIVE_PARTIAL_SECONDS = float(os.getenv("LIVE_PARTIAL_SECONDS", "1.0"))
+# Speech = frame energy this many dB above the noise floor (and above LIVE_VAD_MIN_DBFS)
+LIVE_VAD_MARGIN_DB = float(os.getenv("LIVE_VAD_MARGIN_DB", "12"))
+LIVE_VAD_MIN_DBFS = float(os.getenv("LIVE_VAD_MIN_DBFS", "-45"))
+LIVE_PREROLL_MS = 300
+
+
+# -------------------------------
+# Frame sources
+# -------------------------------
+def microphone_frames(fs=SAMPLE_RATE, frame_ms=LIVE_FRAME_MS):
+    """Yield float32 mono frames from the default microphone until the consumer stops iterating."""
+    import sounddevice as sd
+
+    frames = queue.Queue()
+    blocksize = int(fs * frame_ms / 1000)
+
+    def _callback(indata, n_frames, time_info, status):
+        frames.put(indata[:, 0].copy())
+
+    with sd.InputStream(samplerate=fs, channels=1, dtype="float32", blocksize=blocksize, callback=_callback):
+        while True:
+            yield frames.get()
+
+
+def wav_frames(path, fs=SAMPLE_RATE, frame_ms=LIVE_FRAME_MS, realtime=False):
+    """Same frames as microphone_frames, read from an audio file (any format ffmpeg can decode)."""
+    from audio_decode import decode_audio_bytes
+
+    with open(path, "rb") as f:
+        audio = decode_audio_bytes(f.read(), fs)
+    yield from array_frames(audio, fs, frame_ms, realtime)
+
+
+def array_frames(audio, fs=SAMPLE_RATE, frame_ms=LIVE_FRAME_MS, realtime=False):
+    """Same frames again, from a decoded float32 buffer."""
+    size = int(fs * frame_ms / 1000)
+    for start in range(0, len(audio), size):
+        if realtime:
+            time.sleep(frame_ms / 1000)
+        yield audio[start:start + size]
+
+
+def trim_leading_silence(audio, fs=SAMPLE_RATE, threshold_dbfs=LIVE_VAD_MIN_DBFS + LIVE_VAD_MARGIN_DB):
+    """The clip from its first loud 30 ms frame on, to test input that starts with speech."""
+    size = int(fs * 0.03)
+    for start in range(0, len(audio), size):
+        frame = audio[start:start + size]
+        if 10 * np.log10(np.mean(np.square(frame, dtype=np.float64)) + 1e-10) > threshold_dbfs:
+            return audio[start:]
+    return audio
+
+
+# -------------------------------
+# Buffering and endpointing
+# -------------------------------
+class AudioRingBuffer:
+    """Fixed-capacity float32 buffer; once full, the oldest samples are overwritten."""
+
+    def __init__(self, max_samples):
+        self._data = np.zeros(max_samples, dtype=np.float32)
+        self._pos = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, frame):
+        frame = frame[-len(self._data):]
+        end = self._pos + len(frame)
+        if end <= len(self._data):
+            self._data[self._pos:end] = frame
+        else:
+            split = len(self._data) - self._pos
+            self._data[self._pos:] = frame[:split]
+            self._data[:end - len(self._data)] = frame[split:]
+        self._pos = end % len(self._data)
+        self._size = min(self._size + len(frame), len(self._data))
+
+    def full(self):
+        return self._size == len(self._data)
+
+    def view(self):
+        """The buffered samples, oldest first (a copy only when the buffer has wrapped)."""
+        if self._size < len(self._data):
+            return self._data[:self._size]
+        return np.concatenate((self._data[self._pos:], self._data[:self._pos]))
+
+    def clear(self):
+        self._pos = self._size = 0
+
+
+class EnergyVAD:
+    """
+    Frame-level speech detector: energy above an adapting noise floor.
+    The floor starts at min_dbfs rather than at the first frame, so input that begins with speech
+    is still detected; it then follows quieter frames down quickly and louder ones up slowly
+    (very slowly during speech, so steady background noise is eventually treated as silence).
+    """
+
+    def __init__(self, margin_db=LIVE_VAD_MARGIN_DB, min_dbfs=LIVE_VAD_MIN_DBFS):
+        self.margin_db = margin_db
+        self.min_dbfs = min_dbfs
+        self.noise_floor = min_dbfs
+
+    def is_speech(self, frame):
+        dbfs = 10 * np.log10(np.mean(np.square(frame, dtype=np.float64)) + 1e-10)
+        speech = dbfs > max(self.noise_floor + self.margin_db, self.min_dbfs)
+        if dbfs < self.noise_floor:
+            rate = 0.5
+        else:
+            rate = 0.01 if speech else 0.05
+        self.noise_floor += rate * (dbfs - self.noise_floor)
+        return speech
+
+
+def stable_prefix(previous, current):
+    """Words two consecutive hypotheses agree on; these are not expected to change any more."""
+    prefix = []
+    for a, b in zip(previous.split(), current.split()):
+        if a != b:
+            break
+        prefix.append(b)
+    return " ".join(prefix)
+
+
+# -------------------------------
+# Streaming transcriber
+# -------------------------------
+class LiveTranscriber:
+    """
+    Streams frames into a ring buffer and transcribes one utterance with faster-whisper.
+    Partial hypotheses are produced every partial_seconds of new speech; the utterance ends
+    after silence_ms of trailing silence, when the buffer is full, or when the frames run out.
+    """
+
+    def __init__(self, model, fs=SAMPLE_RATE, language=None, silence_ms=LIVE_SILENCE_MS,
+                 partial_seconds=LIVE_PARTIAL_SECONDS, max_seconds=LIVE_MAX_SECONDS,
+                 start_timeout=LIVE_START_TIMEOUT_SECONDS, final_beam_size=5):
+        self.model = model
+        self.fs = fs
+        self.language = language
+        self.silence_samples = int(fs * silence_ms / 1000)
+        self.partial_samples = int(fs * partial_seconds)
+        self.start_timeout_samples = int(fs * start_timeout)
+        self.final_beam_size = final_beam_size
+        self.buffer = AudioRingBuffer(int(fs * max_seconds))
+
+    def _transcribe(self, audio, beam_size):
+        segments, info = self.model.transcribe(audio, beam_size=beam_size, language=self.language,
+                                               condition_on_previous_text=False)
+        return " ".join(segment.text for segment in segments).strip()
+
+    def run(self, frames, on_partial=None):
+        """Consume frames until the end of one utterance and return its final transcription."""
+        vad = EnergyVAD()
+        preroll = AudioRingBuffer(int(self.fs * LIVE_PREROLL_MS / 1000))
+        self.buffer.clear()
+        started = False
+        waited = silence = since_partial = 0
+        hypothesis = ""
+
+        for frame in frames:
+            speech = vad.is_speech(frame)
+            if not started:
+                preroll.append(frame)
+                waited += len(frame)
+                if speech:
+                    started = True
+                    self.buffer.append(preroll.view())
+                elif waited >= self.start_timeout_samples:
+                    break
+                continue
+
+            self.buffer.append(frame)
+            since_partial += len(frame)
+            silence = 0 if speech else silence + len(frame)
+            if silence >= self.silence_samples or self.buffer.full():
+                break
+
+            if on_partial and since_partial >= self.partial_samples:
+                since_partial = 0
+                current = self._transcribe(self.buffer.view(), beam_size=1)
+                on_partial(stable_prefix(hypothesis, current), current)
+                hypothesis = current
+
+        if hasattr(frames, "close"):
+            frames.close()
+        if not started:
+            return ""
+        return self._transcribe(self.buffer.view(), beam_size=self.final_beam_size)
+
+
+def print_partial(stable, hypothesis):
+    print(f"\r📝 {stable} … {hypothesis[len(stable):].strip()}", end="", flush=True)
+
+
+if __name__ == "__main__":
+    # python live_transcription.py clip.wav [--realtime]  (no microphone needed)
+    # Runs the clip as recorded, then starting directly with speech (leading silence trimmed).
+    from asr_models import get_asr_model, FASTER_WHISPER
+    from audio_decode import decode_audio_bytes
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "uploads/voice_input.wav"
+    realtime = "--realtime" in sys.argv
+    with open(path, "rb") as f:
+        clip = decode_audio_bytes(f.read())
+    transcriber = LiveTranscriber(get_asr_model(FASTER_WHISPER, "small"))
+    for name, audio in (("as recorded", clip), ("speech first", trim_leading_silence(clip))):
+        print(f"▶️ {name}")
+        start = time.perf_counter()
+        text = transcriber.run(array_frames(audio, realtime=realtime), on_partial=print_partial)
+        print(f"\n✅ Final: {text}")
+        print(f"⏱️ {time.perf_counter() - start:.2f}s, {len(transcriber.buffer) / SAMPLE_RATE:.1f}s of speech buffered")
+        assert text, f"no transcription for the {name} clip"
@@ -1,8 +1,16 @@
 from together import Together
 from config import TOGETHER_API_KEY
+import os
+
+# Point at a compatible server (e.g. stub_llm_server.py) for offline runs
+TOGETHER_BASE_URL = os.getenv("TOGETHER_BASE_URL")
+
 class TogetherChat:
-    def __init__(self, model="meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo"):
-        self.client = Together(api_key=TOGETHER_API_KEY)
+    def __init__(self, model="meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo", base_url=TOGETHER_BASE_URL):
+        if base_url:
+            self.client = Together(api_key=TOGETHER_API_KEY, base_url=base_url)
+        else:
+            self.client = Together(api_key=TOGETHER_API_KEY)
         self.model = model
 
     def __call__(self, messages):
@@ -10,4 +18,16 @@ class TogetherChat:
         formatted = [{"role": m["role"], "content": m["content"]} for m in messages]
         resp = self.client.chat.completions.create(model=self.model, messages=formatted, stream=False)
         return resp.choices[0].message.content.strip()
-llm = TogetherChat()
\ No newline at end of file
+
+    def stream(self, messages):
+        """Yield completion text pieces as they arrive."""
+        formatted = [{"role": m["role"], "content": m["content"]} for m in messages]
+        resp = self.client.chat.completions.create(model=self.model, messages=formatted, stream=True)
+        for chunk in resp:
+            if not chunk.choices:
+                continue
+            delta = getattr(chunk.choices[0], "delta", None)
+            text = getattr(delta, "content", None) if delta else None
+            if text:
+                yield text
+llm = TogetherChat()
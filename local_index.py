@@ -0,0 +1,81 @@
+# local_index.py
+import os
+import json
+import threading
+from collections import namedtuple
+import numpy as np
+
+# Written by vectorStore__hajer.py at ingest time: <name>.npy (float32, L2-normalized rows) + <name>.json (payloads)
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join("KB", "index"))
+
+# Same attributes the Qdrant ScoredPoint exposes to embedding_search
+LocalHit = namedtuple("LocalHit", ["id", "score", "payload"])
+
+
+def _normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def write_local_index(name, vectors, payloads, index_dir=LOCAL_INDEX_DIR):
+    """Persist one collection as a contiguous float32 matrix plus its payloads."""
+    if len(vectors) != len(payloads):
+        raise ValueError("vectors and payloads must have the same length")
+    os.makedirs(index_dir, exist_ok=True)
+    matrix = np.ascontiguousarray(_normalize_rows(vectors))
+    np.save(os.path.join(index_dir, f"{name}.npy"), matrix)
+    with open(os.path.join(index_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump(payloads, f, ensure_ascii=False)
+    print(f"Wrote local index '{name}' ({matrix.shape[0]} x {matrix.shape[1]})")
+
+
+class LocalIndex:
+    """
+    In-process cosine index over a memory-mapped float32 matrix.
+    Top-k is a single matrix-vector product; no network hop.
+    """
+
+    def __init__(self, name, index_dir=LOCAL_INDEX_DIR):
+        self.name = name
+        self.matrix = np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+        with open(os.path.join(index_dir, f"{name}.json"), encoding="utf-8") as f:
+            self.payloads = json.load(f)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def search(self, query_vector, limit=3, score_threshold=None):
+        q = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm == 0 or len(self) == 0:
+            return []
+        scores = self.matrix @ (q / norm)
+
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        hits = []
+        for i in top:
+            score = float(scores[i])
+            if score_threshold is not None and score < score_threshold:
+                break
+            hits.append(LocalHit(id=int(i), score=score, payload=self.payloads[i]))
+        return hits
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_local_index(name):
+    """Shared LocalIndex per collection name, opened on first use."""
+    index = _indexes.get(name)
+    if index is None:
+        with _lock:
+            index = _indexes.get(name)
+            if index is None:
+                index = _indexes[name] = LocalIndex(name)
+    return index
@@ -1,16 +1,17 @@
 # main.py
 import sys
 import os
-import json
-from pathlib import Path
 from dotenv import load_dotenv
 
 # your existing modules (unchanged workflow)
 from query_handler import answer_query
-from speech_io import transcribe_audio_file, text_to_speech, transcribe_live
+from speech_io import transcribe_audio_file, text_to_speech, transcribe_live, transcribe_live_streaming
 from translation import detect_language, translate_to_english, translate_from_english
 from grammar_correction import correct_grammar
 from llm_client import llm
+from conversation_store import conversation_store, TAIL_CACHE_SIZE
+from history_window import history_assembler
+from session_cache import session_cache
 
 load_dotenv()
 
@@ -18,8 +19,11 @@ load_dotenv()
 ZEP_API_URL = os.getenv("ZEP_API_URL", "https://api.getzep.com")
 ZEP_API_KEY = os.getenv("ZEP_API_KEY")  # set in .env
 USER_ID = os.getenv("ZEP_USER_ID", "user_123")
+# Voice mode capture: "stream" (stops on silence, shows partial text) or "fixed" (5-second block)
+LIVE_MODE = os.getenv("LIVE_MODE", "stream")
 
-LOCAL_FALLBACK = Path("local_zep_fallback.json")
+# Messages read back from the local store per history fetch (within the in-memory tail by default)
+LOCAL_HISTORY_LIMIT = int(os.getenv("LOCAL_HISTORY_LIMIT", str(TAIL_CACHE_SIZE)))
 
 # ---------------- Initialize Zep client (robust) ----------------
 zep_client = None
@@ -61,35 +65,37 @@ else:
     print("⚠️ Zep client not available. Using local fallback storage.")
 
 # ---------------- Local fallback helpers ----------------
-def _read_local():
-    if not LOCAL_FALLBACK.exists():
-        return []
-    try:
-        return json.loads(LOCAL_FALLBACK.read_text(encoding="utf8"))
-    except Exception:
-        return []
+# An old local_zep_fallback.json array is imported with: python conversation_store.py migrate
+def _read_local(user_id=USER_ID):
+    # Recent messages only, served from the store's in-memory tail
+    return conversation_store.last(user_id, LOCAL_HISTORY_LIMIT)
 
-def _write_local(messages):
-    LOCAL_FALLBACK.write_text(json.dumps(messages, ensure_ascii=False, indent=2), encoding="utf8")
+def _append_local(role, content, user_id=USER_ID):
+    conversation_store.append(user_id, role, content)
 
-def _append_local(role, content):
-    msgs = _read_local()
-    msgs.append({"role": role, "content": content})
-    _write_local(msgs)
+def _clear_local(user_id=USER_ID):
+    return conversation_store.clear(user_id)
 
-def _clear_local():
-    try:
-        if LOCAL_FALLBACK.exists():
-            LOCAL_FALLBACK.unlink()
-            return True
-    except Exception:
-        pass
-    return False
+# Idle sessions release their cached history, summary state and local tail
+session_cache.max_messages = LOCAL_HISTORY_LIMIT
+session_cache.on_evict(history_assembler.reset)
+session_cache.on_evict(conversation_store.forget)
 
 # ---------------- Zep wrapper helpers ----------------
 def get_zep_history(user_id=USER_ID):
     """
     Return list of messages [{"role":..., "content":...}, ...] in chronological order.
+    Served from the per-session cache when possible; otherwise fetched from Zep/local and cached.
+    """
+    cached = session_cache.get(user_id)
+    if cached is not None:
+        return cached
+    msgs = _fetch_zep_history(user_id)
+    session_cache.put(user_id, msgs)
+    return msgs
+
+def _fetch_zep_history(user_id=USER_ID):
+    """
     Tries a few common zep SDK methods; falls back to local JSON.
     """
     if zep_client:
@@ -140,7 +146,7 @@ def get_zep_history(user_id=USER_ID):
             pass
 
     # fallback to local storage
-    local = _read_local()
+    local = _read_local(user_id)
     return [{"role": m.get("role"), "content": m.get("content")} for m in local]
 
 def save_zep_message(role, content, user_id=USER_ID):
@@ -148,6 +154,12 @@ def save_zep_message(role, content, user_id=USER_ID):
     Save a message (role/content) to Zep (or fallback).
     Returns True on success.
     """
+    saved = _save_zep_message(role, content, user_id)
+    if saved:
+        session_cache.append(user_id, role, content)
+    return saved
+
+def _save_zep_message(role, content, user_id=USER_ID):
     if zep_client:
         # try top-level convenience add_memory(user_id, role=..., content=...)
         try:
@@ -185,7 +197,7 @@ def save_zep_message(role, content, user_id=USER_ID):
 
     # fallback to local append
     try:
-        _append_local(role, content)
+        _append_local(role, content, user_id)
         return True
     except Exception:
         return False
@@ -234,14 +246,19 @@ def clear_zep_memory(user_id=USER_ID):
         except Exception:
             pass
 
-    if _clear_local():
+    if _clear_local(user_id):
         cleared = True
+    session_cache.drop(user_id)
+    history_assembler.reset(user_id)
     return cleared
 
 # ---------------- Keep your workflow but integrate Zep ----------------
-def build_history_for_llm():
-    """Return conversation list for the LLM in the format [{'role':..., 'content':...}, ...]."""
-    msgs = get_zep_history()
+def build_history_for_llm(user_id=USER_ID):
+    """
+    Return conversation list for the LLM in the format [{'role':..., 'content':...}, ...].
+    The system prompt is kept once, recent turns fit HISTORY_TOKEN_BUDGET and older turns are summarized.
+    """
+    msgs = get_zep_history(user_id)
     conv = []
     for m in msgs:
         role = (m.get("role") or "").lower()
@@ -258,7 +275,7 @@ def build_history_for_llm():
                 conv.append({"role": "system", "content": content})
             else:
                 conv.append({"role": "user", "content": content})
-    return conv
+    return history_assembler.assemble(user_id, conv)
 
 def show_recap():
     msgs = get_zep_history()
@@ -418,7 +435,10 @@ def main():
                 print("⚠️ Invalid input. Defaulting to 'auto'.")
                 lang_mode = "auto"
 
-            print("🎤 Ready to record. Press ENTER to start recording (5 sec), or type 'back'/'exit'.")
+            if LIVE_MODE == "stream":
+                print("🎤 Ready to record. Press ENTER and speak; recording stops when you pause. Or type 'back'/'exit'.")
+            else:
+                print("🎤 Ready to record. Press ENTER to start recording (5 sec), or type 'back'/'exit'.")
             while True:
                 cmd = input(">>> ").strip().lower()
                 if cmd in ("back", "b"):
@@ -432,7 +452,10 @@ def main():
                     continue
 
                 try:
-                    user_input = transcribe_live(duration=5, forced_lang=lang_mode)
+                    if LIVE_MODE == "stream":
+                        user_input = transcribe_live_streaming(forced_lang=lang_mode)
+                    else:
+                        user_input = transcribe_live(duration=5, forced_lang=lang_mode)
                 except Exception as e:
                     print(f"❌ Error transcribing live audio: {e}")
                     continue
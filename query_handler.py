@@ -1,6 +1,6 @@
 # query_handler.py
 from translation import detect_language, translate_to_english, translate_from_english
-from embedding_search import search_faq, search_kb
+from embedding_search import retrieve, RetrievalContext
 from llm_client import llm
 import asyncio
 from search_agent import search_agent_fallback,register_search_in_kb
@@ -8,6 +8,7 @@ from qdrant_client import QdrantClient
 import os
 import numpy as np
 from embedding_search import embedder
+from relevance_gate import relevance_gate
 import uuid
 
 QDRANT_URL = os.getenv("QDRANT_URL")
@@ -32,15 +33,20 @@ def detect_greeting_language(query: str) -> str:
         return "en"
     return None
 
-def is_breast_cancer_related(text: str) -> bool:
+def is_breast_cancer_related(text: str, ctx=None) -> bool:
     """
-    Quick keyword-based check, then use LLM classification to confirm
-    if the query is about breast cancer or related topics.
+    Quick keyword-based check, then embedding similarity to the FAQ/KB centroids,
+    and only for ambiguous scores an (cached) LLM classification.
     """
     keywords = ["breast cancer", "mammogram", "tumor", "mastectomy", "her2", "biopsy"]
     if any(k in text.lower() for k in keywords):
         return True
 
+    return relevance_gate.check(text, classify_with_llm, ctx=ctx)
+
+
+def classify_with_llm(text: str) -> bool:
+    """Ask the LLM whether the query is about breast cancer or related topics."""
     system_prompt = (
         "You are an AI classifier. Answer ONLY YES or NO whether this query is about breast cancer or related topics. "
         "The query may be in English, Arabic, or French."
@@ -55,14 +61,10 @@ def is_breast_cancer_related(text: str) -> bool:
     return resp.strip().lower().startswith("yes")
 
 
-def ask_llm_with_context(question: str, context: str, lang: str = "en") -> str:
-    """
-    Use LLM to answer a question based strictly on given context.
-    Includes empathetic support for breast cancer patients.
-    """
+def build_context_prompt(question: str, context: str, lang: str = "en") -> str:
     lang_map = {"en": "English", "ar": "Arabic", "fr": "French"}
     lang_name = lang_map.get(lang, "English")
-    prompt = f"""
+    return f"""
 You are a helpful, empathetic medical assistant AI for breast cancer patients.
 Use ONLY the CONTEXT below to answer the question.
 Answer in {lang_name}. Include a supportive message or mental health tip when appropriate in Tunisia.
@@ -73,15 +75,40 @@ QUESTION: {question}
 CONTEXT:
 {context}
 """
-    
+
+
+def ask_llm_with_context(question: str, context: str, lang: str = "en") -> str:
+    """
+    Use LLM to answer a question based strictly on given context.
+    Includes empathetic support for breast cancer patients.
+    """
+    prompt = build_context_prompt(question, context, lang)
+
     # THIS is where you call the llm
     return llm([{"role": "system", "content": prompt}])
+
+
+def stream_llm_with_context(question: str, context: str, lang: str = "en"):
+    """Same as ask_llm_with_context, yielding text pieces as the LLM produces them."""
+    prompt = build_context_prompt(question, context, lang)
+    yield from llm.stream([{"role": "system", "content": prompt}])
+
+
 def answer_query(query: str, return_kb_only=False):
     """
     Answer query using a clear three-step fallback: FAQ → KB → Web.
     Only one is used per query (no mixing).
     If return_kb_only=True, returns (context, source_type)
     """
+    ctx = RetrievalContext()
+    try:
+        return _answer_query(query, return_kb_only, ctx)
+    finally:
+        if ctx.encodes or ctx.encodes_saved:
+            print(f"🧮 Query embeddings: {ctx.encodes} encoded, {ctx.encodes_saved} saved")
+
+
+def _answer_query(query: str, return_kb_only, ctx):
     # Step 1: Greeting
     greeting_words = {"hi", "hello", "hey", "salut", "bonjour", "مرحبا", "السلام عليكم", "أهلا", "أهلاً", "أهلا وسهلا", "عسلامة"}
     greetings_map = {
@@ -101,15 +128,15 @@ def answer_query(query: str, return_kb_only=False):
     query_en = translate_to_english(query, lang)
 
     # Step 3: Breast cancer relevance check
-    if not is_breast_cancer_related(query_en):
+    if not is_breast_cancer_related(query_en, ctx=ctx):
         reason = {
             "ar": "❌ أستطيع فقط الإجابة على الأسئلة المتعلقة بسرطان الثدي.",
             "fr": "❌ Je ne peux répondre qu'aux questions sur le cancer du sein.",
         }.get(lang, "❌ I can only answer questions about breast cancer.")
         return (reason, "not_relevant") if return_kb_only else reason
 
-    # Step 4: Try FAQ
-    faq_answer = search_faq(query_en)
+    # Step 4: Try FAQ (KB hits come back with it in batched mode)
+    faq_answer, kb_hits = retrieve(query_en, ctx=ctx)
     if faq_answer:
         if return_kb_only:
             return (faq_answer, "faq")
@@ -117,7 +144,6 @@ def answer_query(query: str, return_kb_only=False):
         return f"✅ FAQ: {translated}\n\n{('اسأل المزيد إذا أردت!' if lang == 'ar' else 'N’hésitez pas à poser plus de questions !' if lang == 'fr' else 'Ask more if you like!')}"
 
     # Step 5: Try KB
-    kb_hits = search_kb(query_en)
     if kb_hits:
         context = "\n\n---\n\n".join(f"[{h['source']} | sim={h['sim']:.3f}]\n{h['chunk']}" for h in kb_hits)
         if return_kb_only:
@@ -131,5 +157,5 @@ def answer_query(query: str, return_kb_only=False):
     if return_kb_only:
         return (web_fallback_en, "web")
     final = translate_from_english(web_fallback_en, lang) if lang != "en" else web_fallback_en
-    register_search_in_kb(query_en, web_fallback_en, source="search_agent_fallback")
+    register_search_in_kb(query_en, web_fallback_en, source="search_agent_fallback", ctx=ctx)
     return f"🌐 Web: {final}"
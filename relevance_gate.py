@@ -0,0 +1,140 @@
+# relevance_gate.py
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from embedding_search import (
+    RetrievalContext, collection_vectors, normalize_query, FAQ_COLLECTION, DOCS_COLLECTION
+)
+
+# Cosine similarity to the nearest corpus centroid: above ACCEPT is relevant, below REJECT is not,
+# anything in between is sent to the LLM classifier.
+RELEVANCE_ACCEPT = float(os.getenv("RELEVANCE_ACCEPT", "0.45"))
+RELEVANCE_REJECT = float(os.getenv("RELEVANCE_REJECT", "0.15"))
+RELEVANCE_CACHE_TTL = float(os.getenv("RELEVANCE_CACHE_TTL", "86400"))
+RELEVANCE_CACHE_SIZE = int(os.getenv("RELEVANCE_CACHE_SIZE", "4096"))
+# After a failed centroid build, wait this long before retrying (doubling per failure, up to the max)
+RELEVANCE_RETRY_SECONDS = float(os.getenv("RELEVANCE_RETRY_SECONDS", "30"))
+RELEVANCE_RETRY_MAX_SECONDS = float(os.getenv("RELEVANCE_RETRY_MAX_SECONDS", "600"))
+
+
+class RelevanceGate:
+    """
+    Embedding fast path in front of the LLM relevance classifier.
+    Centroids of the FAQ and KB vectors are built on first use; LLM verdicts are cached with a TTL.
+    """
+
+    def __init__(self, accept=RELEVANCE_ACCEPT, reject=RELEVANCE_REJECT,
+                 ttl=RELEVANCE_CACHE_TTL, max_entries=RELEVANCE_CACHE_SIZE):
+        self.accept = accept
+        self.reject = reject
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.counters = {"fast_accept": 0, "fast_reject": 0, "llm_fallback": 0, "llm_cache_hit": 0}
+        self._centroids = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._verdicts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def centroids(self):
+        """
+        Normalized FAQ/KB centroids, built on first use. A failed build (e.g. Qdrant unreachable)
+        is retried with exponential backoff; until then an empty array is returned so callers go
+        straight to the LLM instead of repeating the collection scroll on every query.
+        """
+        if self._centroids is not None:
+            return self._centroids
+        if time.monotonic() < self._retry_at:
+            return np.zeros((0, 0), dtype=np.float32)
+        try:
+            rows = []
+            for name in (FAQ_COLLECTION, DOCS_COLLECTION):
+                vectors = collection_vectors(name)
+                if len(vectors) == 0:
+                    continue
+                vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+                centroid = vectors.mean(axis=0)
+                rows.append(centroid / np.linalg.norm(centroid))
+        except Exception as e:
+            self._failures += 1
+            delay = min(RELEVANCE_RETRY_SECONDS * 2 ** (self._failures - 1), RELEVANCE_RETRY_MAX_SECONDS)
+            self._retry_at = time.monotonic() + delay
+            print(f"⚠️ Relevance centroids unavailable ({e}); retrying in {delay:.0f}s")
+            return np.zeros((0, 0), dtype=np.float32)
+        self._failures = 0
+        self._centroids = np.asarray(rows, dtype=np.float32)
+        return self._centroids
+
+    def score(self, text, ctx=None):
+        centroids = self.centroids()
+        if len(centroids) == 0:
+            return None
+        ctx = ctx or RetrievalContext()
+        q = np.asarray(ctx.embed(text), dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        return float((centroids @ q).max())
+
+    def _cached_verdict(self, key):
+        with self._lock:
+            entry = self._verdicts.get(key)
+            if entry is None:
+                return None
+            verdict, expires = entry
+            if expires < time.monotonic():
+                del self._verdicts[key]
+                return None
+            self._verdicts.move_to_end(key)
+            return verdict
+
+    def _store_verdict(self, key, verdict):
+        with self._lock:
+            self._verdicts[key] = (verdict, time.monotonic() + self.ttl)
+            self._verdicts.move_to_end(key)
+            while len(self._verdicts) > self.max_entries:
+                self._verdicts.popitem(last=False)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def check(self, text, classify, ctx=None):
+        """
+        Return True if text is relevant. classify(text) -> bool is the LLM fallback,
+        only called when the similarity falls in the ambiguous band and no cached verdict exists.
+        """
+        try:
+            sim = self.score(text, ctx)
+        except Exception as e:
+            print(f"⚠️ Relevance fast path unavailable: {e}")
+            sim = None
+
+        if sim is not None and sim >= self.accept:
+            self._count("fast_accept")
+            print(f"🎯 Relevance: fast accept (sim={sim:.3f})")
+            return True
+        if sim is not None and sim < self.reject:
+            self._count("fast_reject")
+            print(f"🎯 Relevance: fast reject (sim={sim:.3f})")
+            return False
+
+        key = normalize_query(text).lower()
+        verdict = self._cached_verdict(key)
+        if verdict is not None:
+            self._count("llm_cache_hit")
+            return verdict
+
+        self._count("llm_fallback")
+        print(f"🎯 Relevance: LLM fallback (sim={'n/a' if sim is None else f'{sim:.3f}'})")
+        verdict = classify(text)
+        self._store_verdict(key, verdict)
+        return verdict
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, accept=self.accept, reject=self.reject, cached_verdicts=len(self._verdicts),
+                        fast_path=self._centroids is not None, centroid_failures=self._failures)
+
+
+relevance_gate = RelevanceGate()
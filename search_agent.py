@@ -5,7 +5,7 @@ from playwright.async_api import async_playwright
 from config import SERPER_API_KEY
 import os
 import numpy as np
-from embedding_search import embedder
+from embedding_search import RetrievalContext
 import uuid
 from qdrant_client import QdrantClient
 
@@ -49,9 +49,10 @@ async def fetch_text(url):
             print(f"Fallback failed ({url}): {e2}")
             return ""
         
-def register_search_in_kb(query, answer, source="search_agent_fallback"):
+def register_search_in_kb(query, answer, source="search_agent_fallback", ctx=None):
     try:
-        vector = embedder.encode([answer], convert_to_numpy=True)[0]
+        ctx = ctx or RetrievalContext()
+        vector = ctx.embed(answer)
         print(f"Registering search result in KB... (source={source})")
         print(f"Vector shape: {vector.shape}")
 
@@ -0,0 +1,83 @@
+# session_cache.py
+import os
+import threading
+import time
+from collections import deque
+
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "1800"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "1000"))
+# Messages kept per cached session (main.py sets this to LOCAL_HISTORY_LIMIT)
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "200"))
+
+
+class SessionHistoryCache:
+    """
+    In-process write-through cache of each session's message history,
+    so a turn does not refetch the history from Zep. Sessions idle for longer
+    than idle_seconds (or beyond max_sessions, least recently used first) are evicted;
+    each session keeps only its last max_messages messages.
+    """
+
+    def __init__(self, idle_seconds=SESSION_IDLE_SECONDS, max_sessions=SESSION_MAX, max_messages=SESSION_MAX_MESSAGES):
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._on_evict = []
+
+    def on_evict(self, callback):
+        """Register callback(session_id) run for every evicted session."""
+        self._on_evict.append(callback)
+
+    def get(self, session_id):
+        self.evict_idle()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            entry["last_seen"] = time.monotonic()
+            return list(entry["messages"])
+
+    def put(self, session_id, messages):
+        with self._lock:
+            self._sessions[session_id] = {"messages": deque(messages, maxlen=self.max_messages),
+                                          "last_seen": time.monotonic()}
+        self.evict_idle()
+
+    def append(self, session_id, role, content):
+        """Append to a cached session; uncached sessions are left to the next full fetch."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry["messages"].append({"role": role, "content": content})
+                entry["last_seen"] = time.monotonic()
+
+    def drop(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def evict_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [sid for sid, e in self._sessions.items() if now - e["last_seen"] > self.idle_seconds]
+            overflow = len(self._sessions) - len(expired) - self.max_sessions
+            if overflow > 0:
+                live = sorted((e["last_seen"], sid) for sid, e in self._sessions.items() if sid not in expired)
+                expired.extend(sid for _, sid in live[:overflow])
+            for sid in expired:
+                del self._sessions[sid]
+
+        for sid in expired:
+            for callback in self._on_evict:
+                try:
+                    callback(sid)
+                except Exception as e:
+                    print(f"⚠️ Session eviction hook failed for {sid}: {e}")
+        return expired
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+session_cache = SessionHistoryCache()
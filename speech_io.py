@@ -1,18 +1,34 @@
 # speech_io.py
-from faster_whisper import WhisperModel
 from gtts import gTTS
 import sounddevice as sd
 import numpy as np
 import tempfile
-import scipy.io.wavfile
+import time
 from playsound import playsound
 import os
+from asr_models import get_asr_model, FASTER_WHISPER
+from audio_decode import decode_audio_bytes
+from live_transcription import LiveTranscriber, microphone_frames, print_partial
 
-# Initialize Whisper model once
-whisper_model = WhisperModel("small", device="cpu")
+# Shared Whisper model from the process-wide registry
+whisper_model = get_asr_model(FASTER_WHISPER, "small")
 
-def transcribe_audio_file(filepath):
-    segments, info = whisper_model.transcribe(filepath, beam_size=5)
+def pcm16_to_float32(audio_data):
+    """int16 PCM samples to the float32 [-1, 1) array Whisper expects, in a single allocation."""
+    return np.divide(audio_data, 32768.0, dtype=np.float32)
+
+
+def transcribe_array(audio, beam_size=5, language=None):
+    """Transcribe a mono 16 kHz float32 buffer held in memory."""
+    segments, info = whisper_model.transcribe(audio, beam_size=beam_size, language=language)
+    return " ".join(segment.text for segment in segments).strip()
+
+
+def transcribe_audio_file(source):
+    """Transcribe a file path, or uploaded audio bytes (decoded in memory, nothing written to disk)."""
+    if isinstance(source, (bytes, bytearray)):
+        return transcribe_array(decode_audio_bytes(bytes(source)))
+    segments, info = whisper_model.transcribe(source, beam_size=5)
     full_text = " ".join(segment.text for segment in segments)
     return full_text.strip()
 
@@ -38,7 +54,7 @@ def text_to_speech(text, lang):
     except Exception as e:
         print(f"⚠️ Text-to-speech error: {e}")
 
-# New function to record from mic and save temporary wav
+# Record from the mic; returns int16 samples in memory (nothing is written to disk)
 def record_audio(duration=5, fs=16000):
     print(f"🎙 Recording for {duration} seconds...")
     recording = sd.rec(int(duration * fs), samplerate=fs, channels=1, dtype='int16')
@@ -47,21 +63,71 @@ def record_audio(duration=5, fs=16000):
 
     return recording.flatten(), fs
 
-def save_temp_wav(audio_data, fs):
-    tmp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-    scipy.io.wavfile.write(tmp_file.name, fs, audio_data)
-    return tmp_file.name
-
 def transcribe_live(duration=5, forced_lang="auto"):
     audio_data, fs = record_audio(duration)
-    wav_path = save_temp_wav(audio_data, fs)
 
     # Use forced language if provided
-    if forced_lang == "auto":
-        segments, info = whisper_model.transcribe(wav_path, beam_size=1)
-    else:
-        segments, info = whisper_model.transcribe(wav_path, beam_size=1, language=forced_lang)
+    language = None if forced_lang == "auto" else forced_lang
+    text = transcribe_array(pcm16_to_float32(audio_data), beam_size=1, language=language)
+    print("📝 Transcribed Text:", text)
+    return text
 
-    text = " ".join(segment.text for segment in segments).strip()
+
+def transcribe_live_streaming(forced_lang="auto", on_partial=print_partial):
+    """Like transcribe_live, but streams the microphone and stops when the speaker pauses."""
+    language = None if forced_lang == "auto" else forced_lang
+    print("🎙 Listening... (stops when you pause)")
+    transcriber = LiveTranscriber(whisper_model, language=language)
+    text = transcriber.run(microphone_frames(), on_partial=on_partial)
+    print()
     print("📝 Transcribed Text:", text)
     return text
+
+
+def check_in_memory_transcription(path, repeat=3):
+    """
+    Run a recorded clip through the live path (int16 -> float32 -> Whisper) and the bytes path
+    of transcribe_audio_file; report mean latency per utterance and how many temp files appeared.
+    Temp files are counted in a private directory set as tempfile.tempdir (and TMPDIR for
+    subprocesses) for the duration of the check, so other processes cannot affect the count.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    pcm16 = (decode_audio_bytes(data) * 32767).astype(np.int16)  # what record_audio returns
+    report = {}
+
+    previous_tempdir, previous_env = tempfile.tempdir, os.environ.get("TMPDIR")
+    with tempfile.TemporaryDirectory() as private_tmp:
+        tempfile.tempdir = os.environ["TMPDIR"] = private_tmp
+        try:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                text = transcribe_array(pcm16_to_float32(pcm16), beam_size=1)
+            report["live_ms"] = (time.perf_counter() - start) / repeat * 1000
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                transcribe_audio_file(data)
+            report["bytes_ms"] = (time.perf_counter() - start) / repeat * 1000
+
+            report["new_temp_files"] = len(os.listdir(private_tmp))
+        finally:
+            tempfile.tempdir = previous_tempdir
+            if previous_env is None:
+                os.environ.pop("TMPDIR", None)
+            else:
+                os.environ["TMPDIR"] = previous_env
+
+    report["text"] = text
+    return report
+
+
+if __name__ == "__main__":
+    # python speech_io.py clip.wav
+    import sys
+    clip = sys.argv[1] if len(sys.argv) > 1 else "uploads/voice_input.wav"
+    report = check_in_memory_transcription(clip)
+    print(f"📝 {report['text']}")
+    print(f"live path {report['live_ms']:.0f} ms/utterance | bytes path {report['bytes_ms']:.0f} ms/utterance")
+    print(f"new temp files: {report['new_temp_files']}")
+    assert report["new_temp_files"] == 0, "in-memory transcription wrote temp files"
@@ -0,0 +1,71 @@
+# stub_llm_server.py
+"""
+Minimal OpenAI/Together-compatible chat completions server for offline runs.
+
+    python stub_llm_server.py
+    TOGETHER_BASE_URL=http://localhost:8001/v1 python api.py
+
+Replies by echoing the last user/system message word by word, streamed as SSE when stream=true.
+"""
+import json
+import os
+import time
+import uuid
+from flask import Flask, Response, request, jsonify
+
+app = Flask(__name__)
+
+STUB_TOKEN_DELAY = float(os.getenv("STUB_TOKEN_DELAY", "0.05"))
+
+
+def _reply_for(messages):
+    last = messages[-1]["content"] if messages else ""
+    return f"This is a stub answer. You said: {last.strip()[:200]}"
+
+
+@app.route("/v1/chat/completions", methods=["POST"])
+def chat_completions():
+    body = request.get_json(force=True)
+    model = body.get("model", "stub")
+    reply = _reply_for(body.get("messages", []))
+    completion_id = f"stub-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        return jsonify({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(reply.split()), "total_tokens": len(reply.split())}
+        })
+
+    def generate():
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            piece = word if i == 0 else " " + word
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            time.sleep(STUB_TOKEN_DELAY)
+        done = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        }
+        yield f"data: {json.dumps(done)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return Response(generate(), mimetype="text/event-stream")
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=int(os.getenv("STUB_LLM_PORT", "8001")))
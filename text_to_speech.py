@@ -1,10 +1,19 @@
 from gtts import gTTS
 from gtts.lang import tts_langs
+import hashlib
 import os
+import threading
 
 # Preload supported language codes from gTTS
 GTTS_LANGS = tts_langs()
 
+# Content-addressed audio cache served from /static/tts_cache
+TTS_CACHE_DIR = os.path.join("static", "tts_cache")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+_cache_locks = {}
+_cache_locks_guard = threading.Lock()
+
 def pick_tld_for_accent(lang_code: str) -> str:
     """Choose a gTTS tld to better match accent when possible.
     This is a best-effort mapping for common cases.
@@ -376,3 +385,88 @@ def synthesize_speech(text, lang_code="en", output_path="static/llm_response.mp3
                 raise fallback_error
         else:
             raise e
+
+
+# -------------------------------
+# Content-addressed TTS cache
+# -------------------------------
+def _normalize_tts_text(text):
+    return " ".join((text or "").split())
+
+def tts_cache_key(text, lang_code="en"):
+    """Hash of (normalized text, gTTS lang, tld) identifying one synthesized clip."""
+    lang = get_gtts_lang(lang_code)
+    tld = pick_tld_for_accent(lang_code)
+    raw = f"{lang}|{tld}|{_normalize_tts_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def tts_cache_path(text, lang_code="en"):
+    return os.path.join(TTS_CACHE_DIR, tts_cache_key(text, lang_code) + ".mp3")
+
+def tts_cache_url(path):
+    return "/static/tts_cache/" + os.path.basename(path)
+
+def _key_lock(key):
+    with _cache_locks_guard:
+        lock = _cache_locks.get(key)
+        if lock is None:
+            lock = _cache_locks[key] = threading.Lock()
+        return lock
+
+def evict_tts_cache(max_bytes=None):
+    """Delete least recently used clips until the cache fits in max_bytes."""
+    max_bytes = TTS_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        entries = []
+        with os.scandir(TTS_CACHE_DIR) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".mp3") and not entry.name.startswith("."):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+    except FileNotFoundError:
+        return 0
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    if removed:
+        print(f"[TTS] Evicted {removed} cached clips")
+    return removed
+
+def synthesize_cached(text, lang_code="en"):
+    """
+    Return (path, cached) for the clip of text in lang_code, synthesizing it only on a cache miss.
+    Concurrent requests for the same clip wait for a single synthesis.
+    """
+    key = tts_cache_key(text, lang_code)
+    path = os.path.join(TTS_CACHE_DIR, key + ".mp3")
+
+    with _key_lock(key):
+        try:
+            os.utime(path)  # refresh LRU position
+            print(f"[TTS] Cache hit: {path}")
+            return path, True
+        except FileNotFoundError:
+            pass  # miss, or evicted by another request since
+
+        os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+        tmp_path = os.path.join(TTS_CACHE_DIR, f".{key}.{threading.get_ident()}.mp3")
+        try:
+            synthesize_speech(text, lang_code=lang_code, output_path=tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    with _cache_locks_guard:
+        _cache_locks.pop(key, None)
+    evict_tts_cache()
+    return path, False
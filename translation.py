@@ -1,54 +1,335 @@
 # translation.py
-from langdetect import detect
-from transformers import pipeline
-
-# Initialize translation pipelines once
-en_to_ar = pipeline("translation", model="Helsinki-NLP/opus-mt-en-ar", device=-1)
-ar_to_en = pipeline("translation", model="Helsinki-NLP/opus-mt-ar-en", device=-1)
-fr_to_en = pipeline("translation", model="Helsinki-NLP/opus-mt-fr-en", device=-1)
-en_to_fr = pipeline("translation", model="Helsinki-NLP/opus-mt-en-fr", device=-1)
-
-def detect_language(text):
-    try:
-        # For very short texts, use some heuristics first
-        text_lower = text.lower().strip()
-        
-        # Common English words that indicate English
-        english_indicators = ['hello', 'hi', 'hey', 'what', 'how', 'when', 'where', 'why', 'who', 'the', 'a', 'an', 'is', 'are', 'was', 'were', 'have', 'has', 'had', 'do', 'does', 'did', 'can', 'could', 'will', 'would', 'should', 'may', 'might']
-        
-        # Check if text contains English indicators
-        if any(word in text_lower for word in english_indicators):
-            print(f"[LANG] Text contains English indicators: {text}")
-            return "en"
-        
-        # Use langdetect for longer texts or when no clear indicators
-        lang = detect(text)
-        print(f"[LANG] langdetect result: {lang} for text: '{text}'")
-        
-        # Normalize to base language codes for translation
-        if lang and "-" in lang:
-            lang = lang.split("-")[0]
-        return lang
-    except Exception as e:
-        print(f"[LANG] Error in language detection: {e}")
-        return "en"
+import os
+import re
+import threading
+import math
+import time
+from collections import Counter
+from language_detection import detect_language
+from translation_cache import translation_cache
+
+TRANSLATION_MODELS = {
+    "en-ar": "Helsinki-NLP/opus-mt-en-ar",
+    "ar-en": "Helsinki-NLP/opus-mt-ar-en",
+    "fr-en": "Helsinki-NLP/opus-mt-fr-en",
+    "en-fr": "Helsinki-NLP/opus-mt-en-fr",
+}
+# At most this many directions stay loaded; the least recently used one is evicted first
+TRANSLATION_MAX_LOADED = int(os.getenv("TRANSLATION_MAX_LOADED", "4"))
+# Directions unused for this long are unloaded (0 disables idle eviction)
+TRANSLATION_IDLE_SECONDS = float(os.getenv("TRANSLATION_IDLE_SECONDS", "0"))
+# Comma-separated languages to load at startup, e.g. "ar,fr"
+TRANSLATION_WARMUP = [l.strip() for l in os.getenv("TRANSLATION_WARMUP", "").split(",") if l.strip()]
+# Sentences per padded generate() call, and torch intra-op threads (0 keeps torch's default)
+TRANSLATION_BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", "8"))
+TRANSLATION_THREADS = int(os.getenv("TRANSLATION_THREADS", "0"))
+# "torch" (float32), "int8" (torch dynamic quantization of Linear layers) or "onnx" (ONNX Runtime via optimum)
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "torch")
+
+
+class TranslationModelManager:
+    """
+    Loads a translation direction on first use and keeps its pipeline (tokenizer + model) for reuse.
+    Idle directions are evicted under the TRANSLATION_MAX_LOADED / TRANSLATION_IDLE_SECONDS limits.
+    """
+
+    def __init__(self, models=TRANSLATION_MODELS, max_loaded=TRANSLATION_MAX_LOADED,
+                 idle_seconds=TRANSLATION_IDLE_SECONDS, backend=TRANSLATION_BACKEND):
+        if backend not in ("torch", "int8", "onnx"):
+            raise ValueError(f"Unknown translation backend: {backend}")
+        self.models = models
+        self.backend = backend
+        self.max_loaded = max(1, max_loaded)
+        self.idle_seconds = idle_seconds
+        self._loaded = {}
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._load_locks = {d: threading.Lock() for d in models}
+
+    def _load(self, direction):
+        from transformers import pipeline, AutoTokenizer
+        import torch
+        if TRANSLATION_THREADS > 0:
+            torch.set_num_threads(TRANSLATION_THREADS)
+
+        name = self.models[direction]
+        if self.backend == "torch":
+            return pipeline("translation", model=name, device=-1)
+
+        tokenizer = AutoTokenizer.from_pretrained(name)
+        if self.backend == "onnx":
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+            model = ORTModelForSeq2SeqLM.from_pretrained(name, export=True)
+        else:
+            from transformers import AutoModelForSeq2SeqLM
+            model = AutoModelForSeq2SeqLM.from_pretrained(name).eval()
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return pipeline("translation", model=model, tokenizer=tokenizer, device=-1)
+
+    def get(self, direction):
+        """Return the pipeline for direction ("en-ar", "fr-en", ...), loading it if needed."""
+        if direction not in self.models:
+            raise ValueError(f"Unsupported translation direction: {direction}")
+        translator = self._loaded.get(direction)
+        if translator is None:
+            with self._load_locks[direction]:
+                translator = self._loaded.get(direction)
+                if translator is None:
+                    print(f"🔤 Loading translation model {self.models[direction]}...")
+                    start = time.perf_counter()
+                    translator = self._load(direction)
+                    print(f"✅ Translation model {direction} loaded in {time.perf_counter() - start:.2f}s")
+                    with self._lock:
+                        self._loaded[direction] = translator
+        with self._lock:
+            self._last_used[direction] = time.monotonic()
+        self.evict()
+        return translator
+
+    def evict(self):
+        now = time.monotonic()
+        with self._lock:
+            by_age = sorted(self._loaded, key=lambda d: self._last_used.get(d, 0))
+            victims = []
+            if self.idle_seconds > 0:
+                victims = [d for d in by_age if now - self._last_used.get(d, 0) > self.idle_seconds]
+            remaining = [d for d in by_age if d not in victims]
+            victims += remaining[:max(0, len(remaining) - self.max_loaded)]
+            for d in victims:
+                del self._loaded[d]
+                self._last_used.pop(d, None)
+        for d in victims:
+            print(f"🔤 Unloaded idle translation model {d}")
+        return victims
+
+    def warm_up(self, langs):
+        """Load both directions for each language in langs (e.g. ["ar", "fr"])."""
+        for lang in langs:
+            for direction in (f"en-{lang}", f"{lang}-en"):
+                if direction in self.models:
+                    self.get(direction)
+
+    def loaded(self):
+        return list(self._loaded)
+
+
+translation_models = TranslationModelManager()
+if TRANSLATION_WARMUP:
+    translation_models.warm_up(TRANSLATION_WARMUP)
+
+# Sentence-ending punctuation, including the Arabic question mark, semicolon and full stop
+_SENTENCE_PUNCT = ".!?\u061F\u061B\u06D4"
+
+# Sentence boundary inside a paragraph
+_SENTENCE_SPLIT = re.compile(rf"(?<=[{_SENTENCE_PUNCT}])\s+")
+
+def split_sentences(text):
+    """Split text into paragraphs (lines), each a list of sentences."""
+    return [[s.strip() for s in _SENTENCE_SPLIT.split(line) if s.strip()] for line in text.split("\n")]
+
+def _translate_sentences(sentences, direction, batch_size=None, models=None):
+    translator = (models or translation_models).get(direction)
+    outputs = translator(sentences, batch_size=batch_size or TRANSLATION_BATCH_SIZE)
+    return [o['translation_text'] for o in outputs]
+
+def translate_batched(text, direction, batch_size=None, models=None):
+    """
+    Translate text sentence by sentence in padded batches, then reassemble in order.
+    Avoids truncation at the model's max length and lets long answers use batched generation.
+    """
+    paragraphs = split_sentences(text)
+    sentences = [s for p in paragraphs for s in p]
+    if not sentences:
+        return text
+    translated = iter(_translate_sentences(sentences, direction, batch_size, models))
+    return "\n".join(" ".join(next(translated) for _ in p) for p in paragraphs)
+
+def _cache_key(direction):
+    # Outputs differ between models and backends, so they are cached separately
+    return f"{direction}|{TRANSLATION_MODELS[direction]}|{translation_models.backend}"
+
+def translate_cached(text, direction):
+    """
+    translate_batched backed by the persistent translation cache, one entry per sentence:
+    only sentences never seen before (for this model and backend) go through the model.
+    """
+    paragraphs = split_sentences(text)
+    sentences = [s for p in paragraphs for s in p]
+    if not sentences:
+        return text
+    key = _cache_key(direction)
+    done = {}
+    for sentence in sentences:
+        if sentence not in done:
+            done[sentence] = translation_cache.get(key, sentence)
+    missing = [s for s, t in done.items() if t is None]
+    if missing:
+        for sentence, translated in zip(missing, _translate_sentences(missing, direction)):
+            translation_cache.put(key, sentence, translated)
+            done[sentence] = translated
+    return "\n".join(" ".join(done[s] for s in p) for p in paragraphs)
 
 def translate_to_english(text, lang):
     # Extract base language code for translation
     base_lang = lang.split("-")[0] if lang and "-" in lang else lang
     
-    if base_lang == "ar":
-        return ar_to_en(text)[0]['translation_text']
-    elif base_lang == "fr":
-        return fr_to_en(text)[0]['translation_text']
+    if base_lang in ("ar", "fr"):
+        return translate_cached(text, f"{base_lang}-en")
     return text
 
 def translate_from_english(text, lang):
     # Extract base language code for translation
     base_lang = lang.split("-")[0] if lang and "-" in lang else lang
     
-    if base_lang == "ar":
-        return en_to_ar(text)[0]['translation_text']
-    elif base_lang == "fr":
-        return en_to_fr(text)[0]['translation_text']
+    if base_lang in ("ar", "fr"):
+        return translate_cached(text, f"en-{base_lang}")
     return text
+
+
+# Sentence end followed by whitespace (or a newline on its own)
+_SENTENCE_END = re.compile(rf"(?<=[{_SENTENCE_PUNCT}])\s+|\n+")
+
+def translate_stream_from_english(pieces, lang):
+    """
+    Translate a stream of English text pieces sentence by sentence.
+    English passes through unchanged; for ar/fr each completed sentence is translated and yielded.
+    """
+    base_lang = lang.split("-")[0] if lang and "-" in lang else lang
+    if base_lang not in ("ar", "fr"):
+        yield from pieces
+        return
+
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        parts = _SENTENCE_END.split(buffer)
+        buffer = parts.pop()
+        for sentence in parts:
+            if sentence.strip():
+                yield translate_from_english(sentence.strip(), lang) + " "
+    if buffer.strip():
+        yield translate_from_english(buffer.strip(), lang)
+
+
+# Fixed sentence set for backend parity checks
+PARITY_SENTENCES = {
+    "en": [
+        "Breast cancer is the most common cancer in women.",
+        "A mammogram is an X-ray of the breast.",
+        "Your doctor may recommend surgery followed by radiotherapy.",
+        "It is normal to feel anxious after a diagnosis.",
+        "Hormone therapy can lower the risk of the cancer coming back.",
+        "Please talk to your nurse about any side effects.",
+    ],
+    "fr": [
+        "Le cancer du sein est le cancer le plus fréquent chez la femme.",
+        "Une mammographie est une radiographie du sein.",
+        "Votre médecin peut recommander une chirurgie suivie d'une radiothérapie.",
+        "Il est normal de se sentir anxieuse après un diagnostic.",
+    ],
+    "ar": [
+        "سرطان الثدي هو أكثر أنواع السرطان شيوعا لدى النساء.",
+        "تصوير الثدي بالأشعة هو فحص بالأشعة السينية للثدي.",
+        "قد يوصي طبيبك بالجراحة ثم العلاج الإشعاعي.",
+        "من الطبيعي أن تشعري بالقلق بعد التشخيص.",
+    ],
+}
+
+
+def corpus_bleu(hypotheses, references, max_n=4):
+    """Corpus BLEU (0-100) of hypotheses against single references, whitespace-tokenized."""
+    matches = [0] * max_n
+    totals = [0] * max_n
+    hyp_len = ref_len = 0
+    for hyp, ref in zip(hypotheses, references):
+        h, r = hyp.split(), ref.split()
+        hyp_len += len(h)
+        ref_len += len(r)
+        for n in range(1, max_n + 1):
+            h_ngrams = Counter(tuple(h[i:i + n]) for i in range(len(h) - n + 1))
+            r_ngrams = Counter(tuple(r[i:i + n]) for i in range(len(r) - n + 1))
+            matches[n - 1] += sum(min(c, r_ngrams[g]) for g, c in h_ngrams.items())
+            totals[n - 1] += max(0, len(h) - n + 1)
+    if hyp_len == 0 or min(matches) == 0:
+        return 0.0
+    log_precision = sum(math.log(m / t) for m, t in zip(matches, totals)) / max_n
+    brevity = 1.0 if hyp_len > ref_len else math.exp(1 - ref_len / hyp_len)
+    return 100 * brevity * math.exp(log_precision)
+
+
+def compare_backends(backend="int8", repeat=3):
+    """
+    BLEU of `backend` against the float32 PyTorch output on PARITY_SENTENCES,
+    plus mean latency per direction for both backends.
+    """
+    reference = TranslationModelManager(backend="torch")
+    candidate = TranslationModelManager(backend=backend)
+    report = {}
+    for direction in TRANSLATION_MODELS:
+        src = PARITY_SENTENCES[direction.split("-")[0]]
+        row = {}
+        outputs = {}
+        for name, manager in (("torch", reference), (backend, candidate)):
+            translator = manager.get(direction)
+            translator(src[:1])  # warm-up
+            start = time.perf_counter()
+            for _ in range(repeat):
+                out = [o['translation_text'] for o in translator(src, batch_size=len(src))]
+            row[f"{name}_ms"] = (time.perf_counter() - start) / repeat * 1000
+            outputs[name] = out
+        row["bleu"] = corpus_bleu(outputs[backend], outputs["torch"])
+        report[direction] = row
+    return report
+
+
+def _rss_mb():
+    import resource
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def benchmark_translation(text, direction="en-fr", batch_sizes=(1, 4, 8, 16), repeat=3):
+    """Seconds per call: whole string in one pass vs sentence-batched at each batch size."""
+    translator = translation_models.get(direction)
+    translator(text)  # warm-up
+    timings = {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        translator(text)
+    timings["whole"] = (time.perf_counter() - start) / repeat
+    for bs in batch_sizes:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            translate_batched(text, direction, batch_size=bs)
+        timings[f"batched(bs={bs})"] = (time.perf_counter() - start) / repeat
+    return timings
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "parity":
+        # python translation.py parity [int8|onnx]
+        backend = sys.argv[2] if len(sys.argv) > 2 else "int8"
+        for direction, row in compare_backends(backend).items():
+            print(f"{direction}: BLEU vs torch {row['bleu']:.1f} | torch {row['torch_ms']:.0f} ms | "
+                  f"{backend} {row[backend + '_ms']:.0f} ms")
+        sys.exit(0)
+
+    # Startup cost of the lazy manager vs loading every direction up front (the old import-time behaviour)
+    print(f"lazy startup: {_rss_mb():.0f} MB RSS, 0 models loaded")
+    start = time.perf_counter()
+    translation_models.warm_up(["ar", "fr"])
+    print(f"all four directions: {time.perf_counter() - start:.2f}s load, {_rss_mb():.0f} MB peak RSS")
+
+    sample_answer = (
+        "Breast cancer is treated with surgery, radiotherapy, chemotherapy, hormone therapy or targeted therapy. "
+        "Your team will plan treatment based on the type, stage and grade of the cancer. "
+        "Many people have a combination of treatments.\n"
+        "Side effects depend on the treatment you have. Tiredness is very common. "
+        "Talk to your nurse if you feel anxious or low; support is available. "
+        "You can also contact a support organisation for emotional help.\n"
+        "After treatment you will have regular check-ups. Tell your doctor about any new symptoms. "
+        "It is normal to worry about the cancer coming back, and talking about it often helps."
+    )
+    for name, secs in benchmark_translation(sample_answer).items():
+        print(f"{name:>16}: {secs:.2f}s")
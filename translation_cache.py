@@ -0,0 +1,156 @@
+# translation_cache.py
+import os
+import sys
+import json
+import time
+import sqlite3
+import atexit
+import hashlib
+import threading
+
+TRANSLATION_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", "translation_cache.sqlite3")
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "50000"))
+# last_used updates from hits are written in batches of this many
+TRANSLATION_CACHE_TOUCH_BATCH = int(os.getenv("TRANSLATION_CACHE_TOUCH_BATCH", "64"))
+
+FAQ_PATH = "KB/FAQ/FAQ.json"
+
+
+class TranslationCache:
+    """
+    Persistent (SQLite) cache of translations keyed by (direction, sha256 of source text),
+    where direction also names the model and backend (see translation._cache_key),
+    with LRU eviction beyond max_entries and hit/miss counters.
+    """
+
+    def __init__(self, path=TRANSLATION_CACHE_PATH, max_entries=TRANSLATION_CACHE_MAX_ENTRIES,
+                 touch_batch=TRANSLATION_CACHE_TOUCH_BATCH):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " direction TEXT NOT NULL,"
+            " source_hash TEXT NOT NULL,"
+            " translation TEXT NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (direction, source_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS translations_lru ON translations (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE translations SET last_used = ? WHERE direction = ? AND source_hash = ?",
+                [(t, d, k) for (d, k), t in self._touched.items()]
+            )
+            self._touched.clear()
+            self._conn.commit()
+
+    def flush(self):
+        """Write pending last_used updates."""
+        with self._lock:
+            self._flush_touched()
+
+    def get(self, direction, text):
+        key = self._hash(text)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT translation FROM translations WHERE direction = ? AND source_hash = ?",
+                (direction, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # Refresh the LRU position lazily, in batches
+            self._touched[(direction, key)] = time.time()
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touched()
+            return row[0]
+
+    def put(self, direction, text, translation):
+        key = self._hash(text)
+        now = time.time()
+        with self._lock:
+            self._touched.pop((direction, key), None)
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO translations (direction, source_hash, translation, last_used) VALUES (?, ?, ?, ?)",
+                (direction, key, translation, now)
+            )
+            if cur.rowcount:
+                self._count += 1
+            else:
+                self._conn.execute(
+                    "UPDATE translations SET translation = ?, last_used = ? WHERE direction = ? AND source_hash = ?",
+                    (translation, now, direction, key)
+                )
+            if self._count > self.max_entries:
+                # Other processes may share the file: recount before evicting
+                self._flush_touched()
+                self._count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+                if self._count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM translations WHERE rowid IN "
+                        "(SELECT rowid FROM translations ORDER BY last_used LIMIT ?)",
+                        (self._count - self.max_entries,)
+                    )
+                    self._count = self.max_entries
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._count
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "entries": entries,
+        }
+
+
+translation_cache = TranslationCache()
+
+
+def pretranslate_faq(langs=("ar", "fr")):
+    """
+    Translate every FAQ entry exactly as answer_query translates a FAQ hit (the indexed
+    "Q: ...\nA: ..." text), so those sentences are cache hits for ar/fr users.
+    LLM-written replies are not covered: they differ from query to query.
+    """
+    from translation import translate_from_english
+
+    with open(FAQ_PATH, encoding="utf-8") as f:
+        faqs = json.load(f)
+    texts = [f"Q: {faq['question']}\nA: {faq['answer']}" for faq in faqs]
+    for lang in langs:
+        start = time.perf_counter()
+        for text in texts:
+            translate_from_english(text, lang)  # new sentences are stored in the cache
+        print(f"Pre-translated {len(texts)} FAQs to {lang} in {time.perf_counter() - start:.1f}s")
+    translation_cache.flush()
+    print(translation_cache.stats())
+
+
+if __name__ == "__main__":
+    # python translation_cache.py pretranslate [ar,fr] | stats
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "pretranslate":
+        langs = sys.argv[2].split(",") if len(sys.argv) > 2 else ["ar", "fr"]
+        pretranslate_faq(langs)
+    else:
+        print(translation_cache.stats())
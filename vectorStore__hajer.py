@@ -2,11 +2,14 @@ import os
 import json
 from dotenv import load_dotenv
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain.vectorstores import Qdrant
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import Distance, VectorParams, CollectionStatus
 from langchain.docstore.document import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from local_index import write_local_index
+from grammar_correction import normalize_if_arabic
 
 # Load environment variables from .env
 load_dotenv()
@@ -23,6 +26,25 @@ DOCS_PATH = "KB/breast_cancer_general_kb"
 # Embedding model (OpenAI-compatible)
 embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
 
+
+class ArabicNormalizingEmbeddings(Embeddings):
+    """
+    Embeds Arabic text in its normalized form while the documents (and so the stored page_content
+    returned as FAQ answers and LLM context) keep the original text, digits and Latin terms included.
+    """
+
+    def __init__(self, base):
+        self.base = base
+
+    def embed_documents(self, texts):
+        return self.base.embed_documents([normalize_if_arabic(t) for t in texts])
+
+    def embed_query(self, text):
+        return self.base.embed_query(normalize_if_arabic(text))
+
+
+index_embeddings = ArabicNormalizingEmbeddings(embeddings)
+
 # Qdrant Cloud client
 client = QdrantClient(
     url=QDRANT_URL,
@@ -69,6 +91,12 @@ def load_text_documents():
                         documents.append(Document(page_content=chunk, metadata={"source": path, "type": "doc"}))
     return documents
 
+def build_local_index(name, docs):
+    # Same vectors and payload layout as the Qdrant collection, for VECTOR_BACKEND=local
+    vectors = index_embeddings.embed_documents([d.page_content for d in docs])
+    payloads = [{"page_content": d.page_content, "metadata": d.metadata} for d in docs]
+    write_local_index(name, vectors, payloads)
+
 def build_vector_store():
     # Recreate collections
     recreate_collection_if_exists("faq_collection")
@@ -78,23 +106,25 @@ def build_vector_store():
     faq_docs = load_faq_documents()
     Qdrant.from_documents(
         faq_docs,
-        embedding=embeddings,
+        embedding=index_embeddings,
         collection_name="faq_collection",
         url=QDRANT_URL,
         api_key=QDRANT_API_KEY
     )
     print(f"Indexed {len(faq_docs)} FAQs")
+    build_local_index("faq_collection", faq_docs)
 
     # Load and index documents
     doc_docs = load_text_documents()
     Qdrant.from_documents(
         doc_docs,
-        embedding=embeddings,
+        embedding=index_embeddings,
         collection_name="docs_collection",
         url=QDRANT_URL,
         api_key=QDRANT_API_KEY
     )
     print(f"Indexed {len(doc_docs)} general KB documents")
+    build_local_index("docs_collection", doc_docs)
 
 if __name__ == "__main__":
     build_vector_store()
@@ -1,24 +1,78 @@
+import os
+import sys
+import time
+import threading
+import subprocess
 import librosa
 import torch
 from transformers import HubertForSequenceClassification, Wav2Vec2FeatureExtractor
 
-# Load model once (to avoid reloading on every request)
 model_name = "superb/hubert-large-superb-er"
-model = HubertForSequenceClassification.from_pretrained(model_name)
-feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(model_name)
+# "torch" (float32), "int8" (torch dynamic quantization of Linear layers) or "onnx" (ONNX Runtime via optimum)
+EMOTION_BACKEND = os.getenv("EMOTION_BACKEND", "torch")
+# torch intra-op threads for the emotion model (0 keeps torch's default)
+EMOTION_THREADS = int(os.getenv("EMOTION_THREADS", "0"))
+# VOICE_EMOTION_ENABLED=0 never loads the model; /analyze_voice then answers without an emotion
+VOICE_EMOTION_ENABLED = os.getenv("VOICE_EMOTION_ENABLED", "1") != "0"
+
+_models = {}
+_models_lock = threading.Lock()
 
 # MSP-Podcast labels
 labels = ['angry', 'happy', 'neutral', 'sad']
 
+# Windowed mode: fixed windows with overlap, run EMOTION_WINDOW_BATCH at a time
+EMOTION_WINDOW_SECONDS = float(os.getenv("EMOTION_WINDOW_SECONDS", "4"))
+EMOTION_HOP_SECONDS = float(os.getenv("EMOTION_HOP_SECONDS", "2"))
+EMOTION_WINDOW_BATCH = int(os.getenv("EMOTION_WINDOW_BATCH", "8"))
+# Shortest clip the windowed mode accepts (padded up to 1 s with the padding masked out)
+EMOTION_MIN_SECONDS = float(os.getenv("EMOTION_MIN_SECONDS", "0.25"))
+
+
+def _load(backend):
+    if backend not in ("torch", "int8", "onnx"):
+        raise ValueError(f"Unknown emotion backend: {backend}")
+    if EMOTION_THREADS > 0:
+        torch.set_num_threads(EMOTION_THREADS)
+
+    print(f"🧠 Loading emotion model {model_name} ({backend})...")
+    feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(model_name)
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForAudioClassification
+        model = ORTModelForAudioClassification.from_pretrained(model_name, export=True)
+    else:
+        model = HubertForSequenceClassification.from_pretrained(model_name).eval()
+        if backend == "int8":
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model, feature_extractor
+
+
+def get_emotion_model(backend=None):
+    """(model, feature_extractor) for backend, loaded on first use and kept for the process lifetime."""
+    backend = backend or EMOTION_BACKEND
+    if not VOICE_EMOTION_ENABLED:
+        raise RuntimeError("Voice emotion is disabled (VOICE_EMOTION_ENABLED=0)")
+    with _models_lock:
+        if backend not in _models:
+            _models[backend] = _load(backend)
+        return _models[backend]
+
+
 def detect_voice_emotion(audio_path):
     print(f"📥 Loading audio: {audio_path}")
     audio, sampling_rate = librosa.load(audio_path, sr=16000)
+    return detect_voice_emotion_from_array(audio, sampling_rate)
+
 
+def detect_voice_emotion_from_array(audio, sampling_rate=16000):
+    """Same as detect_voice_emotion for an already decoded mono float32 buffer at 16 kHz."""
     print(f"🎧 Audio loaded. Duration: {len(audio)/sampling_rate:.2f}s, Sample rate: {sampling_rate}")
 
     if len(audio) < 16000:  # less than 1 second
         raise ValueError("Audio too short for emotion analysis. Minimum 1 second required.")
 
+    model, feature_extractor = get_emotion_model()
+
     # Extract features
     inputs = feature_extractor(audio, sampling_rate=16000, return_tensors="pt", padding=True)
 
@@ -26,13 +80,159 @@ def detect_voice_emotion(audio_path):
     with torch.no_grad():
         logits = model(**inputs).logits
 
-    predicted_id = torch.argmax(logits).item()
-    confidence = torch.nn.functional.softmax(logits, dim=1)[0][predicted_id].item() * 100
-    predicted_emotion = labels[predicted_id]
+    result = _emotion_from_logits(logits[0])
+    print(f"🎯 Predicted Emotion: {result['emotion']} ({result['confidence']})")
+    return result
 
-    print(f"🎯 Predicted Emotion: {predicted_emotion} ({confidence:.2f}%)")
 
+def _emotion_from_logits(logits):
+    """Label and confidence for one row of classifier logits."""
+    probs = torch.nn.functional.softmax(logits, dim=-1)
+    predicted_id = torch.argmax(probs).item()
+    confidence = probs[predicted_id].item() * 100
     return {
-        "emotion": predicted_emotion,
+        "emotion": labels[predicted_id],
         "confidence": f"{confidence:.2f}%"
     }
+
+
+def _batch_logits(audios, sampling_rate=16000, min_length=None, backend=None):
+    """Logits of one padded, attention-masked forward pass; clips are padded to at least min_length samples."""
+    model, feature_extractor = get_emotion_model(backend)
+    longest = max(len(audio) for audio in audios)
+    padding = "max_length" if min_length and longest < min_length else True
+    inputs = feature_extractor(list(audios), sampling_rate=sampling_rate, return_tensors="pt",
+                               padding=padding, max_length=min_length if padding == "max_length" else None,
+                               return_attention_mask=True)
+    with torch.no_grad():
+        return model(**inputs).logits
+
+
+def classify_batch(audios, sampling_rate=16000):
+    """
+    One padded forward pass over several 16 kHz clips.
+    The attention mask keeps padding out of the pooled representation, so each result
+    matches what detect_voice_emotion_from_array returns for that clip alone.
+    """
+    return [_emotion_from_logits(row) for row in _batch_logits(audios, sampling_rate)]
+
+
+def window_bounds(n_samples, window, hop):
+    """(start, end) sample offsets of overlapping windows; the last one is aligned to the end of the clip."""
+    if n_samples <= window:
+        return [(0, n_samples)]
+    starts = list(range(0, n_samples - window + 1, hop))
+    if starts[-1] + window < n_samples:
+        starts.append(n_samples - window)
+    return [(start, start + window) for start in starts]
+
+
+def stream_voice_emotion_windows(audio, sampling_rate=16000, window_seconds=EMOTION_WINDOW_SECONDS,
+                                 hop_seconds=EMOTION_HOP_SECONDS, batch_size=EMOTION_WINDOW_BATCH):
+    """
+    Yield (start_s, end_s, logits) per window, in order, running batch_size windows per forward pass.
+    Windows are views into the buffer, so memory per step is bounded by the batch, not the recording.
+    """
+    if len(audio) < EMOTION_MIN_SECONDS * sampling_rate:
+        raise ValueError(f"Audio too short for emotion analysis. Minimum {EMOTION_MIN_SECONDS:g} seconds required.")
+
+    bounds = window_bounds(len(audio), int(window_seconds * sampling_rate), int(hop_seconds * sampling_rate))
+    for i in range(0, len(bounds), batch_size):
+        chunk = bounds[i:i + batch_size]
+        logits = _batch_logits([audio[start:end] for start, end in chunk], sampling_rate, min_length=sampling_rate)
+        for (start, end), row in zip(chunk, logits):
+            yield start / sampling_rate, end / sampling_rate, row
+
+
+def detect_voice_emotion_windowed(audio, sampling_rate=16000, **window_kwargs):
+    """
+    Utterance emotion from the mean of the window logits, plus a per-window timeline.
+    Same keys as detect_voice_emotion_from_array, with "timeline" and "windows" added.
+    """
+    print(f"🎧 Windowed emotion analysis. Duration: {len(audio)/sampling_rate:.2f}s")
+    total = None
+    timeline = []
+    for start, end, logits in stream_voice_emotion_windows(audio, sampling_rate, **window_kwargs):
+        total = logits if total is None else total + logits
+        timeline.append({"start": round(start, 2), "end": round(end, 2), **_emotion_from_logits(logits)})
+
+    result = _emotion_from_logits(total / len(timeline))
+    result["timeline"] = timeline
+    result["windows"] = len(timeline)
+    print(f"🎯 Predicted Emotion: {result['emotion']} ({result['confidence']}) over {len(timeline)} windows")
+    return result
+
+
+# Audio shipped with the repo for the backend parity check: one real recording plus one gTTS reply
+# (synthetic speech). Put more real recordings in EMOTION_PARITY_DIR or pass them on the command line.
+EMOTION_PARITY_CLIPS = ["uploads/voice_input.wav", "static/llm_response.mp3"]
+EMOTION_PARITY_DIR = os.getenv("EMOTION_PARITY_DIR", "")
+_AUDIO_EXTENSIONS = (".wav", ".mp3", ".webm", ".ogg", ".m4a", ".flac")
+
+
+def parity_clips(extra=()):
+    """Existing parity clips: the bundled ones, EMOTION_PARITY_DIR and `extra`; missing files are skipped."""
+    paths = list(EMOTION_PARITY_CLIPS)
+    if EMOTION_PARITY_DIR and os.path.isdir(EMOTION_PARITY_DIR):
+        paths += sorted(os.path.join(EMOTION_PARITY_DIR, f) for f in os.listdir(EMOTION_PARITY_DIR)
+                        if f.lower().endswith(_AUDIO_EXTENSIONS))
+    paths += list(extra)
+    found = []
+    for path in paths:
+        if os.path.isfile(path):
+            found.append(path)
+        else:
+            print(f"⚠️ Parity clip not found, skipping: {path}")
+    return found
+
+
+def _rss_mb():
+    import resource
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def compare_backends(backend="int8", paths=None, repeat=3):
+    """
+    Label agreement and largest confidence gap (percentage points) of `backend` against
+    float32 on a fixed set of clips, plus mean latency per clip for both.
+    """
+    paths = parity_clips() if paths is None else [p for p in paths if os.path.isfile(p)]
+    if not paths:
+        raise FileNotFoundError("No parity clips found")
+    clips = [librosa.load(path, sr=16000)[0] for path in paths]
+    outputs = {}
+    report = {}
+    for name in ("torch", backend):
+        _batch_logits(clips[:1], backend=name)  # load + warm-up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            outputs[name] = [_emotion_from_logits(_batch_logits([clip], backend=name)[0]) for clip in clips]
+        report[f"{name}_ms"] = (time.perf_counter() - start) / (repeat * len(clips)) * 1000
+
+    pairs = list(zip(outputs["torch"], outputs[backend]))
+    report["agreement"] = sum(a["emotion"] == b["emotion"] for a, b in pairs) / len(pairs)
+    report["max_confidence_gap"] = max(abs(float(a["confidence"][:-1]) - float(b["confidence"][:-1])) for a, b in pairs)
+    report["clips"] = [(path, a, b) for path, (a, b) in zip(paths, pairs)]
+    return report
+
+
+if __name__ == "__main__":
+    # python voice_emotion.py parity [int8|onnx] [extra clips...] | rss [torch|int8|onnx]
+    command = sys.argv[1] if len(sys.argv) > 1 else "parity"
+    backend = sys.argv[2] if len(sys.argv) > 2 else "int8"
+    if command == "rss":
+        baseline = _rss_mb()
+        start = time.perf_counter()
+        get_emotion_model(backend)
+        print(f"{backend}: {time.perf_counter() - start:.1f}s load, {_rss_mb():.0f} MB peak RSS "
+              f"({baseline:.0f} MB before loading)")
+    else:
+        report = compare_backends(backend, parity_clips(sys.argv[3:]))
+        for path, ref, got in report["clips"]:
+            print(f"{path}: torch {ref['emotion']} {ref['confidence']} | {backend} {got['emotion']} {got['confidence']}")
+        print(f"label agreement {report['agreement']:.0%}, max confidence gap {report['max_confidence_gap']:.2f} pts")
+        print(f"latency: torch {report['torch_ms']:.0f} ms/clip | {backend} {report[f'{backend}_ms']:.0f} ms/clip")
+        # Peak RSS is per process, so each backend is measured in a fresh one
+        for name in ("torch", backend):
+            subprocess.run([sys.executable, __file__, "rss", name], check=False)
@@ -0,0 +1,100 @@
+# voice_pipeline.py
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from emotion_batcher import detect_emotion
+from voice_emotion import VOICE_EMOTION_ENABLED
+
+# Transcription and emotion inference run side by side unless VOICE_CONCURRENT=0
+VOICE_CONCURRENT = os.getenv("VOICE_CONCURRENT", "1") != "0"
+# Cores shared by the two models; each gets half so they do not oversubscribe.
+# Only applies to the unbatched emotion path: with EMOTION_BATCH_WINDOW_MS > 0 HuBERT runs on the
+# batcher thread, which uses EMOTION_BATCH_THREADS instead.
+VOICE_CPU_BUDGET = int(os.getenv("VOICE_CPU_BUDGET", str(os.cpu_count() or 2)))
+# At most this many voice requests' inferences in flight (2 tasks each)
+VOICE_MAX_REQUESTS = int(os.getenv("VOICE_MAX_REQUESTS", "2"))
+
+_pool = ThreadPoolExecutor(max_workers=2 * VOICE_MAX_REQUESTS, thread_name_prefix="voice")
+
+
+def _with_threads(n, fn, *args, **kwargs):
+    """
+    Run fn with torch intra-op parallelism limited to n threads, restoring the previous setting after,
+    since pool and request threads are shared.
+    """
+    import torch
+    previous = torch.get_num_threads()
+    torch.set_num_threads(max(1, n))
+    try:
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        return result, round((time.perf_counter() - start) * 1000, 1)
+    finally:
+        torch.set_num_threads(previous)
+
+
+def _transcribe(asr_model, audio):
+    return asr_model.transcribe(audio, task="transcribe", language=None, fp16=False)
+
+
+def run_voice_inference(asr_model, audio, sampling_rate=16000, concurrent=VOICE_CONCURRENT,
+                        cpu_budget=VOICE_CPU_BUDGET):
+    """
+    Transcribe and classify emotion of one decoded clip.
+    Returns (whisper_result, emotion_result or exception, timings); the two inferences are
+    independent and, when concurrent, run on the worker pool with the CPU budget split between them.
+    Emotion failures are returned instead of raised so the caller decides how to handle them;
+    with VOICE_EMOTION_ENABLED=0 only the transcription runs and the emotion result is None.
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    if not VOICE_EMOTION_ENABLED:
+        result, timings["transcribe_ms"] = _with_threads(cpu_budget, _transcribe, asr_model, audio)
+        emotion = None
+    elif concurrent:
+        per_task = max(1, cpu_budget // 2)
+        asr_future = _pool.submit(_with_threads, per_task, _transcribe, asr_model, audio)
+        emotion_future = _pool.submit(_with_threads, per_task, detect_emotion, audio, sampling_rate)
+        result, timings["transcribe_ms"] = asr_future.result()
+        try:
+            emotion, timings["emotion_ms"] = emotion_future.result()
+        except Exception as e:
+            emotion = e
+    else:
+        result, timings["transcribe_ms"] = _with_threads(cpu_budget, _transcribe, asr_model, audio)
+        try:
+            emotion, timings["emotion_ms"] = _with_threads(cpu_budget, detect_emotion, audio, sampling_rate)
+        except Exception as e:
+            emotion = e
+
+    timings["inference_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result, emotion, timings
+
+
+def benchmark_voice_inference(asr_model, audio, budgets=(4, 8), repeat=3):
+    """End-to-end inference latency (ms) of the sequential and concurrent paths for each core budget."""
+    rows = {}
+    run_voice_inference(asr_model, audio, concurrent=False)  # warm-up
+    for budget in budgets:
+        for concurrent in (False, True):
+            total = 0.0
+            for _ in range(repeat):
+                _, _, timings = run_voice_inference(asr_model, audio, concurrent=concurrent, cpu_budget=budget)
+                total += timings["inference_ms"]
+            rows[(budget, "concurrent" if concurrent else "sequential")] = total / repeat
+    return rows
+
+
+if __name__ == "__main__":
+    # python voice_pipeline.py clip.wav
+    from asr_models import get_asr_model, OPENAI_WHISPER
+    from audio_decode import decode_audio_bytes
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "uploads/voice_input.wav"
+    with open(path, "rb") as f:
+        clip = decode_audio_bytes(f.read())
+    model = get_asr_model(OPENAI_WHISPER, "base")
+    for (budget, mode), ms in benchmark_voice_inference(model, clip).items():
+        print(f"{budget} cores, {mode:>10}: {ms:.0f} ms")